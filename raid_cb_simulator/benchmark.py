@@ -0,0 +1,309 @@
+"""
+Benchmarks of the simulation engines, with a golden file of the turns the reference teams must get.
+
+    python raid_cb_simulator/benchmark.py --save results.json
+    python raid_cb_simulator/benchmark.py --baseline results.json
+
+Measures how long one fight of each reference team takes with each engine, how many teams per second each engine
+gets through on a fixed sweep, and how long fixed-size run_variable_configs() sweeps take end to end. Every engine's
+turns are checked against benchmark_golden.json first, and the script fails if an engine the runner relies on for
+speed isn't faster than the one it replaces (see CLAIMED_SPEEDUPS). With a baseline from an earlier run, timings are compared
+and the script fails if any got slower than `--tolerance` allows or if any engine gave different turns, so a new
+engine can be shown to be both faster and identical.
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import timeit
+
+from raid_cb_simulator.characters import (
+    DEACON,
+    DEMON_LORD_NM,
+    DEMON_LORD_UNM,
+    DEMYTHA,
+    DONNIE,
+    DONNIE_MINE,
+    DOOMSCREECH,
+    DPS_1,
+    DPS_2,
+    DPS_3,
+    HEIRESS,
+)
+from raid_cb_simulator.runner import run_variable_configs
+from raid_cb_simulator.simulator import DEMON_LORD_TURN_LIMIT, simulate, simulate_batch
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_golden.json")
+
+# The teams of simulator.test()
+REFERENCE_TEAMS = {
+    "mythheir": [
+        DEMYTHA.to_config(speed=348, priorities=[1, 2, 3], delays=[0, 1, 1]),
+        HEIRESS.to_config(speed=283, priorities=[1, 2], delays=[0, 1]),
+        DOOMSCREECH.to_config(speed=281, priorities=[1, 3, 2], delays=[0, 2, 1]),
+        DEACON.to_config(speed=198, priorities=[1, 2, 3], delays=[0, 0, 0]),
+        DPS_1.to_config(speed=180, priorities=[1]),
+    ],
+    "demytha_donnie": [
+        DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+        DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+        DPS_1.to_config(speed=181, priorities=[1]),
+        DPS_2.to_config(speed=184, priorities=[1]),
+        DPS_3.to_config(speed=189, priorities=[1]),
+    ],
+    "ikuyo_kita": [
+        DONNIE.to_config(speed=98 * 1.12 + 78 + 1, priorities=[1, 3, 2], delays=[0, 0, 0]),
+        DEMYTHA.to_config(speed=102 * (1 + (0.12 * 1.15)) + 138, priorities=[1, 3, 2], delays=[0, 1, 0]),
+        DPS_1.to_config(speed=99 * (1 + (0.05 * 1.15)) + 84 + 1, priorities=[1]),
+        DPS_2.to_config(speed=99 * (1 + (0.12 * 1.15)) + 67, priorities=[1]),
+        DPS_3.to_config(speed=95 * (1 + (0.1 * 1.15)) + 80, priorities=[1]),
+    ],
+}
+
+BOSSES = {"unm": DEMON_LORD_UNM, "nm": DEMON_LORD_NM}
+
+# Teams of the golden sweep: the Demytha/Donnie tune with every DPS speed around the ones it works with, against
+# UNM (against NM they all fail on turn 2)
+SWEEP_FIXED = REFERENCE_TEAMS["demytha_donnie"][:2]
+SWEEP_DPS_SPEEDS = range(179, 192)
+
+
+def sweep_teams():
+    return [
+        SWEEP_FIXED + [dps.to_config(speed=speed, priorities=[1]) for dps, speed in zip([DPS_1, DPS_2, DPS_3], speeds)]
+        for speeds in itertools.product(SWEEP_DPS_SPEEDS, repeat=3)
+    ]
+
+
+# Engine name -> function simulating a list of teams against a boss, returning their turns
+ENGINES = {
+    "tick": lambda teams, boss: [simulate(team, boss) for team in teams],
+    "tick_cycles": lambda teams, boss: [simulate(team, boss, detect_cycles=True) for team in teams],
+    "event_driven": lambda teams, boss: [simulate(team, boss, event_driven=True) for team in teams],
+    "event_driven_cycles": lambda teams, boss: [
+        simulate(team, boss, event_driven=True, detect_cycles=True) for team in teams
+    ],
+    "fixed_point": lambda teams, boss: [simulate(team, boss, event_driven=True, fixed_point=True) for team in teams],
+    "specialized": lambda teams, boss: [simulate(team, boss, specialized=True) for team in teams],
+    "batch": lambda teams, boss: simulate_batch(teams, boss).tolist(),
+}
+
+# (engine, engine it must beat): speed-ups the runner relies on, checked on the golden sweep. The runner simulates
+# with the tick engine and cycle detection; should event_driven_cycles ever beat it, simulate_wrapper() must switch.
+CLAIMED_SPEEDUPS = [
+    ("tick_cycles", "tick"),
+    ("tick_cycles", "event_driven_cycles"),
+    ("specialized", "tick_cycles"),
+    ("batch", "tick_cycles"),
+]
+
+# Name -> (speed range, variable characters) of run_variable_configs() sweeps on top of SWEEP_FIXED
+THROUGHPUT_SWEEPS = {
+    "dps_3x10": ((176, 186), [DPS_1, DPS_2, DPS_3]),
+    "dps_3x20": ((176, 196), [DPS_1, DPS_2, DPS_3]),
+}
+
+# Name -> run_variable_configs() keyword arguments
+THROUGHPUT_VARIANTS = {
+    "default": {},
+    "specialized": {"specialized": True},
+    "batch": {"batch_size": 256},
+}
+
+
+def golden_turns(engine):
+    """Turns of every reference team against every boss, and of the golden sweep, with `engine`."""
+    return {
+        "teams": {
+            name: {boss_name: engine([team], boss)[0] for boss_name, boss in BOSSES.items()}
+            for name, team in REFERENCE_TEAMS.items()
+        },
+        "sweep": engine(sweep_teams(), DEMON_LORD_UNM),
+    }
+
+
+def save_golden(golden, path):
+    """Write golden_turns() to `path`, with the sweep on one line."""
+    with open(path, "w") as f:
+        f.write(f'{{\n "teams": {json.dumps(golden["teams"])},\n "sweep": {json.dumps(golden["sweep"])}\n}}\n')
+
+
+def check_golden(golden):
+    """
+    Compare every engine with the golden turns.
+
+    Returns:
+        dict[str, list[str]]: Per engine, what it got different from the golden file.
+    """
+    mismatches = {}
+    for engine_name, engine in ENGINES.items():
+        turns = golden_turns(engine)
+        differences = [
+            f"{name} vs {boss_name}: {turns['teams'][name][boss_name]} instead of {expected}"
+            for name, expected_by_boss in golden["teams"].items()
+            for boss_name, expected in expected_by_boss.items()
+            if turns["teams"][name][boss_name] != expected
+        ]
+        wrong = [i for i, (a, b) in enumerate(zip(turns["sweep"], golden["sweep"])) if a != b]
+        if wrong:
+            differences.append(f"sweep: {len(wrong)} teams differ, the first is team {wrong[0]}")
+        mismatches[engine_name] = differences
+    return mismatches
+
+
+def best_time(function, repeat):
+    """Seconds of the fastest of `repeat` calls of `function`, after one warm-up call."""
+    function()
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def measure_latency(repeat):
+    """Seconds per fight of each reference team against UNM, per engine."""
+    latency = {}
+    for name, team in REFERENCE_TEAMS.items():
+        latency[name] = {}
+        for engine_name, engine in ENGINES.items():
+            # Enough fights per timing for the timer's resolution and short hiccups not to matter
+            latency[name][engine_name] = best_time(lambda: engine([team] * 100, DEMON_LORD_UNM), repeat) / 100
+    return latency
+
+
+def measure_engine_throughput(repeat):
+    """Teams per second of the golden sweep against UNM in this process, per engine."""
+    teams = sweep_teams()
+    return {
+        engine_name: len(teams) / best_time(lambda: engine(teams, DEMON_LORD_UNM), repeat)
+        for engine_name, engine in ENGINES.items()
+    }
+
+
+def speedups(engine_throughput):
+    """How many times faster each engine of CLAIMED_SPEEDUPS is than the one it must beat, as "fast/slow" -> ratio."""
+    return {f"{fast}/{slow}": engine_throughput[fast] / engine_throughput[slow] for fast, slow in CLAIMED_SPEEDUPS}
+
+
+def measure_sweep_throughput(repeat):
+    """Teams per second of each THROUGHPUT_SWEEPS sweep through run_variable_configs(), per variant."""
+    throughput = {}
+    for sweep_name, (speed_range, variable_characters) in THROUGHPUT_SWEEPS.items():
+        num_teams = (speed_range[1] - speed_range[0]) ** len(variable_characters)
+        throughput[sweep_name] = {}
+        for variant, kwargs in THROUGHPUT_VARIANTS.items():
+
+            def run():
+                # Solutions are printed; keep them out of the report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run_variable_configs(
+                        speed_range, SWEEP_FIXED, variable_characters, DEMON_LORD_UNM, DEMON_LORD_TURN_LIMIT, **kwargs
+                    )
+
+            throughput[sweep_name][variant] = num_teams / best_time(run, repeat)
+    return throughput
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print how every timing compares with `baseline`.
+
+    Returns:
+        list[str]: The timings that got worse by more than `tolerance` (a fraction).
+    """
+    regressions = []
+
+    def compare_metric(path, current, before, higher_is_better):
+        ratio = current / before if higher_is_better else before / current
+        print(f"  {'/'.join(path)}: {ratio:.2f}x {'faster' if ratio >= 1 else 'slower'}")
+        if ratio < 1 - tolerance:
+            regressions.append(f"{'/'.join(path)} is {1 / ratio:.2f}x slower")
+
+    def walk(path, current, before, higher_is_better):
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key in before:
+                    walk(path + [key], value, before[key], higher_is_better)
+        else:
+            compare_metric(path, current, before, higher_is_better)
+
+    print("Compared with the baseline:")
+    walk(["latency"], results["latency"], baseline.get("latency", {}), higher_is_better=False)
+    walk(["engine_throughput"], results["engine_throughput"], baseline.get("engine_throughput", {}), True)
+    walk(["sweep_throughput"], results["sweep_throughput"], baseline.get("sweep_throughput", {}), True)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engines and check their turns against the golden file")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results saved by an earlier run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="Slowdown allowed before failing, as a fraction (timings are noisy)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per measurement; the fastest is kept")
+    parser.add_argument("--skip-sweeps", action="store_true", help="Don't time run_variable_configs() sweeps")
+    parser.add_argument(
+        "--update-golden", action="store_true", help="Rewrite the golden file with the tick-by-tick engine's turns"
+    )
+    args = parser.parse_args()
+
+    if args.update_golden:
+        save_golden(golden_turns(ENGINES["tick"]), GOLDEN_PATH)
+        print(f"Wrote {GOLDEN_PATH}")
+        return
+
+    with open(GOLDEN_PATH) as f:
+        mismatches = check_golden(json.load(f))
+    for engine_name, differences in mismatches.items():
+        print(f"{engine_name}: {'matches the golden file' if not differences else 'MISMATCH'}")
+        for difference in differences:
+            print(f"  {difference}")
+
+    results = {
+        "python": sys.version.split()[0],
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "golden_mismatches": mismatches,
+        "latency": measure_latency(args.repeat),
+        "engine_throughput": measure_engine_throughput(args.repeat),
+        "sweep_throughput": {} if args.skip_sweeps else measure_sweep_throughput(args.repeat),
+    }
+    results["speedups"] = speedups(results["engine_throughput"])
+
+    print("Seconds per fight:")
+    for name, by_engine in results["latency"].items():
+        print(f"  {name}: " + ", ".join(f"{engine}={seconds * 1e6:.0f}us" for engine, seconds in by_engine.items()))
+    print("Teams per second, golden sweep:")
+    print("  " + ", ".join(f"{engine}={rate:.0f}" for engine, rate in results["engine_throughput"].items()))
+    print("Claimed speed-ups, golden sweep:")
+    print("  " + ", ".join(f"{pair}={ratio:.2f}x" for pair, ratio in results["speedups"].items()))
+    for sweep_name, by_variant in results["sweep_throughput"].items():
+        print(f"Teams per second, run_variable_configs() {sweep_name}:")
+        print("  " + ", ".join(f"{variant}={rate:.0f}" for variant, rate in by_variant.items()))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+
+    failed = any(mismatches.values())
+    for pair, ratio in results["speedups"].items():
+        if ratio < 1:
+            print(f"NO SPEED-UP: {pair} is {ratio:.2f}x")
+            failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
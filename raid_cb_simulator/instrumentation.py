@@ -0,0 +1,148 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Dict, Iterable
+
+
+class SimulationStats:
+    """
+    Counters of what simulate() did, summed over every fight it was given them for (see its `stats` argument).
+
+    Attributes:
+        simulations (int): Fights simulated.
+        ticks (int): Ticks the fights lasted, counting ticks skipped by the event-driven engine.
+        empty_ticks (int): Times turn meters were advanced without anyone having moved first: a single tick for
+            the tick-by-tick engine, a jump to the next turn for the event-driven one.
+        turns (int): Turns taken, demon lord turns included.
+        extra_turns (int): Turns that earned the entity moving an extra turn.
+        effects (int): Instant effects used plus buffs and debuffs placed, one per target.
+        failures (Counter): Fights failed, by the demon lord turn they failed on.
+        survived (int): Fights that reached the turn limit or started repeating.
+    """
+
+    def __init__(self):
+        self.simulations = 0
+        self.ticks = 0
+        self.empty_ticks = 0
+        self.turns = 0
+        self.extra_turns = 0
+        self.effects = 0
+        self.failures = Counter()
+        self.survived = 0
+
+    def merge(self, other: "SimulationStats"):
+        """Add the counters of `other` to these."""
+        self.simulations += other.simulations
+        self.ticks += other.ticks
+        self.empty_ticks += other.empty_ticks
+        self.turns += other.turns
+        self.extra_turns += other.extra_turns
+        self.effects += other.effects
+        self.failures.update(other.failures)
+        self.survived += other.survived
+
+    def summary(self) -> str:
+        per_fight = max(self.simulations, 1)
+        lines = [
+            f"simulations: {self.simulations} ({self.survived} survived)",
+            f"ticks: {self.ticks} ({self.ticks / per_fight:.1f} per fight), "
+            f"advanced with nobody moving: {self.empty_ticks} ({self.empty_ticks / per_fight:.1f} per fight)",
+            f"turns: {self.turns} ({self.turns / per_fight:.1f} per fight), extra turns: {self.extra_turns}",
+            f"effects applied: {self.effects} ({self.effects / per_fight:.1f} per fight)",
+        ]
+        if self.failures:
+            failures = ", ".join(f"{turn}: {count}" for turn, count in sorted(self.failures.items()))
+            lines.append(f"failures by demon lord turn: {failures}")
+        return "\n".join(lines)
+
+
+class PhaseTimers:
+    """
+    Wall-clock time spent in named phases of a run, e.g. generating teams or handling results.
+
+    A disabled instance (see NO_TIMERS) hands back a no-op context and the iterables it is given unchanged, so
+    code can be timed unconditionally.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def _phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += perf_counter() - start
+            self.counts[name] += 1
+
+    def phase(self, name: str):
+        """Context manager adding the time spent in it to phase `name`."""
+        return self._phase(name) if self.enabled else nullcontext()
+
+    def timed(self, name: str, iterable: Iterable) -> Iterable:
+        """Iterate over `iterable`, adding the time spent waiting for each item to phase `name`."""
+        if not self.enabled:
+            return iterable
+        return self._timed(name, iterable)
+
+    def _timed(self, name: str, iterable: Iterable):
+        iterator = iter(iterable)
+        while True:
+            with self._phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def between(self, name: str, iterable: Iterable) -> Iterable:
+        """
+        Iterate over `iterable`, adding the time its consumer spends between taking an item and asking for the
+        next one to phase `name`, e.g. a Pool's task handler sending items to the workers.
+        """
+        if not self.enabled:
+            return iterable
+        return self._between(name, iterable)
+
+    def _between(self, name: str, iterable: Iterable):
+        for item in iterable:
+            start = perf_counter()
+            yield item
+            self.seconds[name] += perf_counter() - start
+            self.counts[name] += 1
+
+    def merge(self, other: "PhaseTimers"):
+        """Add the times of `other` to these."""
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+            self.counts[name] += other.counts[name]
+
+    def summary(self) -> str:
+        return "\n".join(
+            f"{name}: {seconds:.3f}s over {self.counts[name]} calls" for name, seconds in self.seconds.items()
+        )
+
+
+NO_TIMERS = PhaseTimers(enabled=False)
+
+
+class RunStats:
+    """
+    Everything instrumented about a run: SimulationStats of the fights and PhaseTimers, of the main process or
+    of a worker. Workers' RunStats are merged into the main process' at the end of a run (see init_worker() in
+    runner.py).
+    """
+
+    def __init__(self):
+        self.simulation = SimulationStats()
+        self.timers = PhaseTimers()
+
+    def merge(self, other: "RunStats"):
+        self.simulation.merge(other.simulation)
+        self.timers.merge(other.timers)
+
+    def summary(self) -> str:
+        return f"{self.simulation.summary()}\n{self.timers.summary()}"
@@ -0,0 +1,318 @@
+import dataclasses
+import enum
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from raid_cb_simulator.simulator import DEMON_LORD_TURN_LIMIT, ENGINE_VERSION
+
+# Layout of ResultStore files, kept in the file's user_version; bump it whenever the tables change
+RESULT_STORE_SCHEMA = 2
+
+
+def team_to_json(team) -> str:
+    """Serialize a list of CharacterConfig to JSON, with abilities as [name, priority, delay]."""
+    return json.dumps(
+        [
+            {
+                "name": c.name,
+                "speed": c.speed,
+                "abilities": [[a.ability.name, a.priority, a.delay] for a in c.abilities],
+            }
+            for c in team
+        ]
+    )
+
+
+class ResultStore:
+    """
+    SQLite file that sweeps write their results to, one chunk of teams at a time.
+
+    A sweep is identified by a description of everything that decides which teams it simulates and in what
+    order (see simulate_teams_resumable() in runner.py). A chunk's results and the mark that it is done are
+    written in one transaction, so a sweep that is stopped at any point can be started again and only simulates
+    the chunks that are missing. Finished sweeps can be queried with sweeps(), counts() and results().
+
+    Every team is kept with the demon lord turn it failed on, or the turn limit if it survived, and whether its
+    fight had a turn meter tie between interchangeable characters (see fill_in_solutions() in runner.py); every
+    chunk with how many of its teams survived. Files record the RESULT_STORE_SCHEMA they were written with, and files of
+    another schema can't be opened.
+
+    Several processes, on one machine or several sharing the file, can work through one sweep together by
+    claiming chunks with claim_chunk().
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, timeout=60)
+        (schema,) = self.connection.execute("PRAGMA user_version").fetchone()
+        (tables,) = self.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()
+        if tables and schema != RESULT_STORE_SCHEMA:
+            self.connection.close()
+            raise ValueError(
+                f"{path} has result store schema {schema}, not {RESULT_STORE_SCHEMA}; use a new file for this version"
+            )
+        # The schema is written in the same transaction as the tables, so nobody sees one without the other
+        self.connection.executescript(
+            f"""
+                BEGIN;
+                CREATE TABLE IF NOT EXISTS sweeps (
+                    id INTEGER PRIMARY KEY,
+                    description TEXT UNIQUE NOT NULL,
+                    turn_limit INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    sweep_id INTEGER NOT NULL REFERENCES sweeps (id),
+                    chunk INTEGER NOT NULL,
+                    teams INTEGER NOT NULL,
+                    survived INTEGER NOT NULL,
+                    PRIMARY KEY (sweep_id, chunk)
+                );
+                CREATE TABLE IF NOT EXISTS results (
+                    sweep_id INTEGER NOT NULL REFERENCES sweeps (id),
+                    chunk INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    team TEXT NOT NULL,
+                    turns INTEGER NOT NULL,
+                    tied INTEGER NOT NULL,
+                    PRIMARY KEY (sweep_id, chunk, position)
+                );
+                CREATE TABLE IF NOT EXISTS claims (
+                    sweep_id INTEGER NOT NULL REFERENCES sweeps (id),
+                    chunk INTEGER NOT NULL,
+                    worker TEXT NOT NULL,
+                    claimed_at REAL NOT NULL,
+                    PRIMARY KEY (sweep_id, chunk)
+                );
+                PRAGMA user_version = {RESULT_STORE_SCHEMA};
+                COMMIT;
+                """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def sweep(self, description: str, turn_limit: int) -> int:
+        """Id of the sweep with this description, which is added if it's new."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO sweeps (description, turn_limit) VALUES (?, ?)", (description, turn_limit)
+            )
+        (sweep_id,) = self.connection.execute("SELECT id FROM sweeps WHERE description = ?", (description,)).fetchone()
+        return sweep_id
+
+    def done_chunks(self, sweep_id: int) -> Dict[int, List[Tuple[int, int, bool]]]:
+        """Chunks of a sweep that are done, each with the (position in the chunk, turns, tied) of every team."""
+        done = {chunk: [] for chunk in self._done_chunk_indices(sweep_id)}
+        for chunk, position, turns, tied in self.connection.execute(
+            """
+            SELECT results.chunk, results.position, results.turns, results.tied FROM results
+            JOIN chunks ON chunks.sweep_id = results.sweep_id AND chunks.chunk = results.chunk
+            WHERE results.sweep_id = ?
+            ORDER BY results.chunk, results.position
+            """,
+            (sweep_id,),
+        ):
+            done[chunk].append((position, turns, bool(tied)))
+        return done
+
+    def _done_chunk_indices(self, sweep_id: int) -> List[int]:
+        chunks = self.connection.execute("SELECT chunk FROM chunks WHERE sweep_id = ?", (sweep_id,))
+        return [chunk for (chunk,) in chunks]
+
+    def add_chunk(self, sweep_id: int, chunk: int, teams: list, turns: List[int], tied: Optional[List[bool]] = None):
+        """Write the results of a chunk of teams, and whether each had a tie (none if None), and mark it done."""
+        (turn_limit,) = self.connection.execute("SELECT turn_limit FROM sweeps WHERE id = ?", (sweep_id,)).fetchone()
+        with self.connection:
+            self.connection.executemany(
+                """
+                INSERT OR REPLACE INTO results (sweep_id, chunk, position, team, turns, tied)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    (sweep_id, chunk, i, team_to_json(team), t, bool(tied is not None and tied[i]))
+                    for i, (team, t) in enumerate(zip(teams, turns))
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO chunks (sweep_id, chunk, teams, survived) VALUES (?, ?, ?, ?)",
+                (sweep_id, chunk, len(teams), sum(t == turn_limit for t in turns)),
+            )
+
+    def claim_chunk(self, sweep_id: int, num_chunks: int, worker: str, stale_after: float = 3600) -> Optional[int]:
+        """
+        Claim the first of chunks 0 to `num_chunks` - 1 of a sweep that is neither done nor claimed, for `worker`.
+
+        Claims older than `stale_after` seconds are taken to belong to a worker that died and can be claimed again.
+
+        Returns:
+            int | None: The claimed chunk, or None if every chunk is done or claimed.
+        """
+        now = time.time()
+        # Take the write lock up front, so two workers never claim the same chunk
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            taken = set(self._done_chunk_indices(sweep_id))
+            taken.update(
+                chunk
+                for (chunk,) in self.connection.execute(
+                    "SELECT chunk FROM claims WHERE sweep_id = ? AND claimed_at > ?", (sweep_id, now - stale_after)
+                )
+            )
+            chunk = next((c for c in range(num_chunks) if c not in taken), None)
+            if chunk is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO claims (sweep_id, chunk, worker, claimed_at) VALUES (?, ?, ?, ?)",
+                    (sweep_id, chunk, worker, now),
+                )
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+        return chunk
+
+    def sweeps(self) -> List[Tuple[int, str, int]]:
+        """(id, description, number of chunks done) of every sweep in the store."""
+        return self.connection.execute(
+            """
+            SELECT sweeps.id, sweeps.description, COUNT(chunks.chunk) FROM sweeps
+            LEFT JOIN chunks ON chunks.sweep_id = sweeps.id
+            GROUP BY sweeps.id ORDER BY sweeps.id
+            """
+        ).fetchall()
+
+    def counts(self, sweep_id: int) -> Tuple[int, int]:
+        """Number of teams in the done chunks of a sweep, and how many of them survived."""
+        teams, survived = self.connection.execute(
+            "SELECT SUM(teams), SUM(survived) FROM chunks WHERE sweep_id = ?", (sweep_id,)
+        ).fetchone()
+        return teams or 0, survived or 0
+
+    def results(self, sweep_id: int, survived_only: bool = False) -> Iterator[Tuple[list, int]]:
+        """
+        Yield (team, turns) for the teams of a sweep simulated so far, in sweep order.
+
+        `team` is the JSON from team_to_json() loaded back, and `turns` is the demon lord turn the team failed on,
+        or the sweep's turn limit if it survived.
+        """
+        query = """
+            SELECT results.team, results.turns FROM results
+            JOIN sweeps ON sweeps.id = results.sweep_id
+            WHERE results.sweep_id = ?
+        """
+        if survived_only:
+            query += " AND results.turns = sweeps.turn_limit"
+        for team, turns in self.connection.execute(query + " ORDER BY results.chunk, results.position", (sweep_id,)):
+            yield json.loads(team), turns
+
+
+def _canonical(value):
+    """Turn configs into plain JSON-able values, ordering sets so the result is the same in every process."""
+    if dataclasses.is_dataclass(value):
+        return [type(value).__name__] + [_canonical(getattr(value, f.name)) for f in dataclasses.fields(value)]
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=json.dumps)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def team_key(characters, demon_lord, turn_limit=None, tie_runs=None) -> bytes:
+    """
+    Hash of a team, its boss, the turn limit of simulate() and ENGINE_VERSION, for SimulationCache; and of the
+    runs simulate() watched for ties, if it was given `tie_runs`.
+
+    Everything about the configs goes in, down to the effects of every ability, so editing a character or an
+    ability never reuses stale results.
+    """
+    key = [ENGINE_VERSION, DEMON_LORD_TURN_LIMIT, turn_limit, _canonical(characters), _canonical(demon_lord)]
+    if tie_runs is not None:
+        key.append([list(run) for run in tie_runs])
+    canonical = json.dumps(key, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).digest()
+
+
+class SimulationCache:
+    """
+    Cache of simulate() results by team_key(), for sweeps that overlap with earlier ones.
+
+    Results are kept in memory up to `max_size` teams, least recently used first out. With a `path`, they are
+    also kept in a SQLite file shared by every process using it. New results are written to the file in
+    batches of `flush_size`, and when the cache is closed.
+
+    A cache can be handed to Pool workers (see init_worker() in runner.py); each gets its own memory tier
+    and connection to the file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = 100_000, flush_size: int = 1000):
+        self.path = path
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.memory = OrderedDict()
+        self.pending = []
+        self.connection = None
+
+    def __getstate__(self):
+        return {"path": self.path, "max_size": self.max_size, "flush_size": self.flush_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            with self.connection:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, turns INTEGER NOT NULL)"
+                )
+        return self.connection
+
+    def _remember(self, key: bytes, turns: int):
+        self.memory[key] = turns
+        if len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key: bytes) -> Optional[int]:
+        """The cached result for a team_key(), or None."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.path is None:
+            return None
+        row = self._connect().execute("SELECT turns FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0])
+        return row[0]
+
+    def put(self, key: bytes, turns: int):
+        """Cache the result for a team_key()."""
+        self._remember(key, turns)
+        if self.path is not None:
+            self.pending.append((key, turns))
+            if len(self.pending) >= self.flush_size:
+                self.flush()
+
+    def flush(self):
+        """Write new results to the file."""
+        if self.pending:
+            with self._connect() as connection:
+                connection.executemany("INSERT OR REPLACE INTO cache (key, turns) VALUES (?, ?)", self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
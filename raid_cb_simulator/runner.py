@@ -1,10 +1,22 @@
+import contextlib
 import itertools
 import math
-from multiprocessing import Pool, cpu_count
+import os
+import pickle
+import socket
+import threading
+import time
+from collections import Counter, OrderedDict
+from multiprocessing import Manager, Pool, cpu_count, util
 from copy import deepcopy
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
 from tqdm import tqdm
 
 from raid_cb_simulator.characters import (
+    CharacterConfig,
     DEMYTHA,
     DONNIE,
     DPS_1,
@@ -13,7 +25,18 @@ from raid_cb_simulator.characters import (
     DPS_3,
     DONNIE_MINE,
 )
-from raid_cb_simulator.simulator import DEMON_LORD_TURN_LIMIT, simulate
+from raid_cb_simulator.effects import Effect
+from raid_cb_simulator.instrumentation import NO_TIMERS, RunStats
+from raid_cb_simulator.results import ResultStore, SimulationCache, team_key, team_to_json
+from raid_cb_simulator.simulator import (
+    DEMON_LORD_TURN_LIMIT,
+    fight_until_failure,
+    simulate,
+    simulate_batch,
+    simulate_speed_samples,
+    simulate_variants,
+    survival_intervals,
+)
 
 
 def generate_character_configs(base_character, speed_range):
@@ -44,15 +67,973 @@ def generate_character_configs(base_character, speed_range):
                 yield base_character.to_config(speed=speed, priorities=prio, delays=list(delay))
 
 
+def config_key(config):
+    """Speed, priorities and delays of a config, as a hashable key."""
+    return config.speed, tuple((a.priority, a.delay) for a in config.abilities)
+
+
+def is_inert(ability):
+    """Whether an ability does nothing besides damage, i.e. has no effects, buffs or debuffs."""
+    return not (ability.effects or ability.buffs or ability.debuffs)
+
+
+def reduces_cooldowns(abilities):
+    """Whether any of the abilities reduces the cooldowns of the rest of the team."""
+    return any(effect.name == Effect.REDUCE_COOLDOWN_2_TURNS.name for ability in abilities for effect in ability.effects)
+
+
+def _next_turn(abilities, cooldowns, delays):
+    """
+    Step one character's cooldowns and delays through one of its turns, like simulate() does.
+
+    Returns:
+        tuple: The new cooldowns and delays, and what the turn did: the index of the ability used, None if it
+        was inert, or -1 if no ability was available.
+    """
+    cooldowns = [max(0, c - 1) for c in cooldowns]
+    chosen_index = -1
+    chosen_priority = 0
+    for i, ability in enumerate(abilities):
+        if cooldowns[i] == 0 and delays[i] == 0 and ability.priority > chosen_priority:
+            chosen_index = i
+            chosen_priority = ability.priority
+    if chosen_index >= 0:
+        cooldowns[chosen_index] = abilities[chosen_index].ability.cooldown
+    delays = tuple(max(0, d - 1) for d in delays)
+
+    if chosen_index >= 0 and is_inert(abilities[chosen_index].ability):
+        action = None
+    else:
+        action = chosen_index
+    return tuple(cooldowns), delays, action
+
+
+def configs_equivalent(config_a, config_b, cooldown_reduction=True):
+    """
+    Whether two configs of the same character use the same ability on every turn, whatever the rest of the team
+    does. Inert abilities (like DEACON_A2) count as the same ability.
+
+    Args:
+        config_a (CharacterConfig): First config.
+        config_b (CharacterConfig): Second config, of the same character.
+        cooldown_reduction (bool): Whether a teammate can reduce this character's cooldowns.
+    """
+    if config_a.speed != config_b.speed:
+        return False
+
+    start = (
+        (0,) * len(config_a.abilities),
+        tuple(a.delay for a in config_a.abilities),
+        (0,) * len(config_b.abilities),
+        tuple(a.delay for a in config_b.abilities),
+    )
+    seen = {start}
+    stack = [start]
+    while stack:
+        cooldowns_a, delays_a, cooldowns_b, delays_b = stack.pop()
+        *next_a, action_a = _next_turn(config_a.abilities, cooldowns_a, delays_a)
+        *next_b, action_b = _next_turn(config_b.abilities, cooldowns_b, delays_b)
+        if action_a != action_b:
+            return False
+
+        successors = [(*next_a, *next_b)]
+        if cooldown_reduction:
+            successors.append(
+                (
+                    tuple(max(0, c - 2) for c in cooldowns_a),
+                    delays_a,
+                    tuple(max(0, c - 2) for c in cooldowns_b),
+                    delays_b,
+                )
+            )
+        for state in successors:
+            if state not in seen:
+                seen.add(state)
+                stack.append(state)
+    return True
+
+
+def group_equivalent_configs(configs, cooldown_reduction=True):
+    """
+    Split configs of one character into classes of configs_equivalent() configs; the first of each class stands
+    for all of them.
+
+    Returns:
+        list[list[CharacterConfig]]: The classes, in order of their representatives.
+    """
+    classes = []
+    classes_by_speed = {}
+    for config in configs:
+        for members in classes_by_speed.setdefault(config.speed, []):
+            if configs_equivalent(members[0], config, cooldown_reduction):
+                members.append(config)
+                break
+        else:
+            classes.append([config])
+            classes_by_speed[config.speed].append(classes[-1])
+    return classes
+
+
+def equivalent_config_lists(base_characters, speed_range, fixed_characters=()):
+    """
+    Generate the configs of every character and group them with group_equivalent_configs().
+
+    Returns:
+        tuple[list[list[CharacterConfig]], list[dict]]: The representatives for each character, and for each
+        character a lookup from config_key() of a representative to its class.
+    """
+    team_abilities = [[a.ability for a in c.abilities] for c in fixed_characters] + [
+        c.abilities for c in base_characters
+    ]
+    config_lists = []
+    class_lookups = []
+    for i, character in enumerate(base_characters):
+        others = team_abilities[: len(fixed_characters) + i] + team_abilities[len(fixed_characters) + i + 1 :]
+        classes = group_equivalent_configs(
+            generate_character_configs(character, speed_range),
+            cooldown_reduction=any(reduces_cooldowns(abilities) for abilities in others),
+        )
+        config_lists.append([members[0] for members in classes])
+        class_lookups.append({config_key(members[0]): members for members in classes})
+    return config_lists, class_lookups
+
+
+def equivalent_teams(team, class_lookups, offset=0):
+    """
+    Yield `team` and every team that only differs from it by configs in the same class, for the characters
+    starting at `offset`.
+    """
+    options = [lookup[config_key(c)] for c, lookup in zip(team[offset:], class_lookups)]
+    for configs in itertools.product(*options):
+        yield team[:offset] + list(configs)
+
+
+# SimulationCache, the tables simulate_indices_wrapper() decodes teams with, whether simulate_wrapper() runs
+# specialized fights and the worker's RunStats if the run is instrumented, set up by init_worker()
+_cache = None
+_team_tables = None
+_specialized = False
+_run_stats = None
+# Tables of the latest SearchExecutor sweeps this worker has seen, by sweep id
+_sweep_tables = OrderedDict()
+
+
+def init_worker(cache=None, team_tables=None, specialized=False, stats_sink=None):
+    """
+    Pool initializer setting up the worker globals above; with a `stats_sink` (see InstrumentedRun), the worker
+    appends its RunStats to it when it exits.
+    """
+    if specialized and stats_sink is not None:
+        raise ValueError("Specialized fights can't be instrumented")
+    global _cache, _team_tables, _specialized, _run_stats
+    _cache = cache
+    _team_tables = team_tables
+    _specialized = specialized
+    if cache is not None:
+        # Write what's still pending to the file when the worker exits; see worker_pool()
+        util.Finalize(cache, cache.close, exitpriority=10)
+    _run_stats = None
+    if stats_sink is not None:
+        _run_stats = RunStats()
+        util.Finalize(_run_stats, stats_sink.append, args=(_run_stats,), exitpriority=10)
+
+
+def worker_pool(cache=None, team_tables=None, specialized=False, stats_sink=None, processes=None):
+    """
+    Create a worker Pool set up with init_worker(), of `processes` workers or one per CPU; close and join it
+    before leaving, so workers write out their cache and stats.
+    """
+    # Checked here as well: a Pool whose initializer raises keeps starting new workers
+    if specialized and stats_sink is not None:
+        raise ValueError("Specialized fights can't be instrumented")
+    return Pool(
+        processes=processes or cpu_count(),
+        initializer=init_worker,
+        initargs=(cache, team_tables, specialized, stats_sink),
+    )
+
+
+class InstrumentedRun:
+    """
+    Context manager collecting the RunStats of a run, from `timers` and the workers' `stats_sink`, and printing
+    their summary at the end.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.run_stats = RunStats() if enabled else None
+        self.timers = self.run_stats.timers if enabled else NO_TIMERS
+        self.manager = None
+        self.stats_sink = None
+
+    def __enter__(self):
+        if self.enabled:
+            self.manager = Manager()
+            self.stats_sink = self.manager.list()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if not self.enabled:
+            return
+        if exc_type is None:
+            for worker_stats in self.stats_sink:
+                self.run_stats.merge(worker_stats)
+            print(f"\n{self.run_stats.summary()}")
+        self.manager.shutdown()
+
+
 def simulate_wrapper(args):
-    """Wrapper to run simulate() on one full team config."""
+    """
+    Wrapper to run simulate() on one full team config, against one boss or a list of them. Bosses of a list that
+    aren't cached are simulated together, sharing the fight up to the first boss turn (see simulate_bosses()).
+
+    `args` may have the runs to watch for turn meter ties as a third item (see simulate()); whether there was one
+    is then returned last. Only fights without a tie are cached.
+    """
+    characters, demon_lord, *tie_runs = args
+    tie_runs = tie_runs[0] if tie_runs else None
+    bosses = demon_lord if isinstance(demon_lord, list) else [demon_lord]
+    keys = [team_key(characters, boss, tie_runs=tie_runs) for boss in bosses] if _cache is not None else None
+    turns = [_cache.get(key) for key in keys] if keys is not None else [None] * len(bosses)
+    missing = [i for i, boss_turns in enumerate(turns) if boss_turns is None]
+
+    tied = False
+    if missing:
+        missing_bosses = [bosses[i] for i in missing]
+        # simulate() never changes the configs it's given. Tick by tick: turns mostly come a tick apart, so jumping
+        # ahead doesn't pay for working out how far (see CLAIMED_SPEEDUPS in benchmark.py)
+        if _run_stats is None:
+            missing_turns = simulate(
+                characters=characters,
+                demon_lord=missing_bosses,
+                detect_cycles=True,
+                specialized=_specialized,
+                tie_runs=tie_runs,
+            )
+        else:
+            with _run_stats.timers.phase("simulate (workers)"):
+                missing_turns = simulate(
+                    characters=characters,
+                    demon_lord=missing_bosses,
+                    detect_cycles=True,
+                    stats=[_run_stats.simulation] * len(missing_bosses),
+                    tie_runs=tie_runs,
+                )
+        if tie_runs is not None:
+            missing_turns, tied = missing_turns
+        for i, boss_turns in zip(missing, missing_turns):
+            turns[i] = boss_turns
+            if keys is not None and not tied:
+                _cache.put(keys[i], boss_turns)
+    turns = turns if isinstance(demon_lord, list) else turns[0]
+    return (turns, characters) if tie_runs is None else (turns, characters, tied)
+
+
+def fixed_point_check_wrapper(args):
+    """Wrapper to run simulate() on one full team config with both the float and the fixed-point engine."""
     characters, demon_lord = args
-    simulated_characters = [deepcopy(c) for c in characters]
-    turns = simulate(characters=simulated_characters, demon_lord=demon_lord)
-    return turns, characters
+    float_turns = simulate(characters=[deepcopy(c) for c in characters], demon_lord=demon_lord, event_driven=True)
+    fixed_point_turns = simulate(
+        characters=[deepcopy(c) for c in characters], demon_lord=demon_lord, event_driven=True, fixed_point=True
+    )
+    return float_turns, fixed_point_turns, characters
+
+
+def simulate_batch_cached(teams, demon_lord, tie_runs=None):
+    """
+    Run simulate_batch() on the teams the worker's cache doesn't have, and return the turns of every team; with
+    `tie_runs`, together with whether each had a turn meter tie (see simulate()). Only teams without one are cached.
+    """
+    if _cache is None:
+        results = simulate_batch(teams=teams, demon_lord=demon_lord, tie_runs=tie_runs)
+        if tie_runs is None:
+            return results.tolist()
+        return results[0].tolist(), results[1].tolist()
+
+    keys = [team_key(team, demon_lord, tie_runs=tie_runs) for team in teams]
+    turns = [_cache.get(key) for key in keys]
+    tied = [False] * len(teams)
+    missing = [i for i, team_turns in enumerate(turns) if team_turns is None]
+    if missing:
+        missing_turns = simulate_batch(teams=[teams[i] for i in missing], demon_lord=demon_lord, tie_runs=tie_runs)
+        missing_tied = [False] * len(missing)
+        if tie_runs is not None:
+            missing_turns, missing_tied = missing_turns[0], missing_turns[1].tolist()
+        for i, team_turns, team_tied in zip(missing, missing_turns.tolist(), missing_tied):
+            turns[i] = team_turns
+            tied[i] = team_tied
+            if not team_tied:
+                _cache.put(keys[i], team_turns)
+    return turns if tie_runs is None else (turns, tied)
+
+
+def simulate_batch_wrapper(args):
+    """
+    Wrapper to run simulate_batch() on a chunk of team configs sharing one roster, with the runs to watch for
+    ties as an optional third item of `args`.
+    """
+    teams, demon_lord, *tie_runs = args
+    with (_run_stats.timers if _run_stats is not None else NO_TIMERS).phase("simulate (workers)"):
+        if not tie_runs:
+            return simulate_batch_cached(teams, demon_lord), teams
+        turns, tied = simulate_batch_cached(teams, demon_lord, tie_runs[0])
+        return turns, teams, tied
+
+
+def simulate_variants_wrapper(args):
+    """
+    Wrapper to run simulate_variants() on a team whose last characters change speed, watching the runs in `args`
+    for turn meter ties. Returns the turns and whether there was a tie for every row of speeds.
+    """
+    characters, demon_lord, variant_speeds, tie_runs = args
+    variant_indices = list(range(len(characters) - len(variant_speeds[0]), len(characters)))
+    results = simulate_variants(
+        characters, demon_lord, variant_indices, variant_speeds, detect_cycles=True, tie_runs=tie_runs
+    )
+    turns, tied = results if tie_runs is not None else (results, np.zeros(len(results), dtype=bool))
+    return turns.tolist(), characters, variant_speeds, tied.tolist()
+
+
+def simulate_speed_samples_wrapper(args):
+    """Wrapper to run simulate_speed_samples() on a chunk of speed rows of one team."""
+    characters, demon_lord, speeds = args
+    return simulate_speed_samples(characters, demon_lord, speeds)
+
+
+def turns_dtype(turn_limit):
+    """Smallest numpy dtype that holds every demon lord turn up to `turn_limit`, which may be math.inf."""
+    if turn_limit == math.inf:
+        return np.float64
+    for dtype in (np.int8, np.int16, np.int32):
+        if turn_limit <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def simulate_indices(team_tables, indices):
+    """
+    Simulate a chunk of teams, each given as a row of indices into the config lists of `team_tables`, which are
+    (fixed characters, config lists, demon lord, runs to watch for ties or None).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The turns of every team as an array of turns_dtype(DEMON_LORD_TURN_LIMIT),
+        with a column per boss if the demon lord is a list of them, and whether each had a turn meter tie in one
+        of the runs (see simulate()).
+    """
+    fixed_characters, config_lists, demon_lord, tie_runs = team_tables
+    shape = (len(indices), len(demon_lord)) if isinstance(demon_lord, list) else len(indices)
+    # simulate_wrapper() runs to simulate()'s default turn limit
+    turns = np.empty(shape, dtype=turns_dtype(DEMON_LORD_TURN_LIMIT))
+    tied = np.zeros(len(indices), dtype=bool)
+    for row, combination in enumerate(indices.tolist()):
+        team = fixed_characters + [configs[i] for configs, i in zip(config_lists, combination)]
+        if tie_runs is None:
+            turns[row] = simulate_wrapper((team, demon_lord))[0]
+        else:
+            turns[row], _, tied[row] = simulate_wrapper((team, demon_lord, tie_runs))
+    return turns, tied
+
+
+def simulate_indices_wrapper(indices):
+    """
+    Wrapper to run simulate_indices() on a chunk of teams with the worker's tables (see simulate_indexed_teams()).
+    Returns the indices, the turns and the ties.
+    """
+    with (_run_stats.timers if _run_stats is not None else NO_TIMERS).phase("task (workers)"):
+        return (indices, *simulate_indices(_team_tables, indices))
+
+
+def simulate_sweep_chunk_wrapper(args):
+    """
+    Wrapper to run simulate_indices() on a chunk of teams of a SearchExecutor sweep. The sweep's tables come
+    pickled with every chunk, but are only unpickled the first time a worker sees the sweep.
+    """
+    sweep_id, pickled_tables, chunk_key, indices = args
+    if sweep_id not in _sweep_tables:
+        _sweep_tables[sweep_id] = pickle.loads(pickled_tables)
+        if len(_sweep_tables) > 16:
+            _sweep_tables.popitem(last=False)
+    return (sweep_id, chunk_key, indices, *simulate_indices(_sweep_tables[sweep_id], indices))
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def simulate_teams(pool, teams, demon_lord, batch_size=None, tie_runs=None):
+    """
+    Simulate teams on a worker pool, yielding (turns, team) pairs as they finish.
+
+    Args:
+        pool (Pool): Worker pool to run on.
+        teams (Iterable[list[CharacterConfig]]): Team configs to simulate.
+        demon_lord (CharacterConfig): Boss configuration.
+        batch_size (int | None): If set, send teams to simulate_batch() in chunks of this size instead of
+            running simulate() once per team. All teams must then share one roster.
+        tie_runs (list[tuple[int, int]] | None): Runs of characters to watch for turn meter ties (see simulate()).
+            If given, yield (turns, team, tied) instead.
+    """
+    extra = () if tie_runs is None else (tie_runs,)
+    if batch_size is None:
+        yield from pool.imap_unordered(simulate_wrapper, ((team, demon_lord, *extra) for team in teams))
+        return
+
+    for batch_turns, batch_teams, *batch_tied in pool.imap_unordered(
+        simulate_batch_wrapper,
+        ((chunk, demon_lord, *extra) for chunk in chunked(teams, batch_size)),
+    ):
+        yield from zip(batch_turns, batch_teams, *batch_tied)
+
+
+def simulate_chunk_wrapper(args):
+    """
+    Wrapper to simulate one chunk of team configs for simulate_teams_resumable(). Returns the chunk index, the
+    teams, their turns and whether each had a turn meter tie in `tie_runs` (none if it is None).
+    """
+    chunk_index, teams, demon_lord, batch_size, tie_runs = args
+    tied = [False] * len(teams)
+    if batch_size is None and tie_runs is None:
+        turns = [simulate_wrapper((team, demon_lord))[0] for team in teams]
+    elif batch_size is None:
+        turns, _, tied = zip(*(simulate_wrapper((team, demon_lord, tie_runs)) for team in teams))
+    elif tie_runs is None:
+        turns = [t for batch in chunked(teams, batch_size) for t in simulate_batch_cached(batch, demon_lord)]
+    else:
+        results = [simulate_batch_cached(batch, demon_lord, tie_runs) for batch in chunked(teams, batch_size)]
+        turns = [t for batch_turns, _ in results for t in batch_turns]
+        tied = [t for _, batch_tied in results for t in batch_tied]
+    return chunk_index, teams, list(turns), list(tied)
+
+
+def resumable_description(description, chunk_size):
+    """The description a resumable sweep is kept under in a ResultStore; chunks depend on their size."""
+    return f"{description}, chunk_size={chunk_size}"
+
+
+def simulate_teams_resumable(
+    pool, store, description, teams, demon_lord, turn_limit, batch_size=None, chunk_size=1000, tie_runs=None
+):
+    """
+    Like simulate_teams(), but writing results to a ResultStore in chunks and skipping the chunks it already has.
+
+    Args:
+        pool (Pool): Worker pool to run on.
+        store (ResultStore): Where results are kept.
+        description (str): Identifies the sweep in the store. Must change whenever `teams` or their order do.
+        teams (Iterable[list[CharacterConfig]]): Team configs to simulate, always generated in the same order.
+        demon_lord (CharacterConfig): Boss configuration.
+        turn_limit (int): Maximum turns before forced stop.
+        batch_size (int | None): Simulate with simulate_batch() in chunks of this size.
+        chunk_size (int): Number of teams per chunk written to the store.
+        tie_runs (list[tuple[int, int]] | None): Runs of characters to watch for turn meter ties (see simulate()).
+            If given, yield (turns, team, tied) instead.
+    """
+    sweep_id = store.sweep(resumable_description(description, chunk_size), turn_limit)
+    done = store.done_chunks(sweep_id)
+    resumed = []
+
+    def result(turns, team, tied):
+        return (turns, team) if tie_runs is None else (turns, team, tied)
+
+    def pending_chunks():
+        for chunk_index, chunk in enumerate(chunked(teams, chunk_size)):
+            if chunk_index in done:
+                resumed.extend(result(turns, chunk[position], tied) for position, turns, tied in done[chunk_index])
+            else:
+                yield chunk_index, chunk, demon_lord, batch_size, tie_runs
+
+    for chunk_index, chunk, turns, tied in pool.imap_unordered(simulate_chunk_wrapper, pending_chunks()):
+        store.add_chunk(sweep_id, chunk_index, chunk, turns, tied)
+        yield from map(result, turns, chunk, tied)
+    yield from resumed
+
+
+def simulate_indexed_teams(pool, combinations, fixed_characters, config_lists, chunk_size=256, ordered=False):
+    """
+    Simulate teams given as config indices on a worker_pool() made with team_tables=(fixed_characters,
+    config_lists, demon_lord, tie_runs), yielding (turns, team, tied) as they finish, where `tied` is whether the
+    fight had a turn meter tie in one of `tie_runs` (see simulate()).
+
+    Args:
+        pool (Pool): Worker pool to run on.
+        combinations (Iterable[tuple[int, ...]]): Index of the config of each character, per team.
+        fixed_characters (list[CharacterConfig]): Characters at the start of every team.
+        config_lists (list[list[CharacterConfig]]): Configs of the other characters.
+        chunk_size (int): Number of teams per task.
+        ordered (bool): Yield results in the order of `combinations` rather than as they finish.
+    """
+    tasks = (np.array(chunk, dtype=np.int32) for chunk in chunked(combinations, chunk_size))
+    imap = pool.imap if ordered else pool.imap_unordered
+    for indices, turns, tied in imap(simulate_indices_wrapper, tasks):
+        for combination, team_turns, team_tied in zip(indices.tolist(), turns.tolist(), tied.tolist()):
+            team = fixed_characters + [configs[i] for configs, i in zip(config_lists, combination)]
+            yield team_turns, team, team_tied
+
+
+class SearchExecutor:
+    """
+    Long-lived worker pool feeding the chunks of many sweeps to its workers as one stream, at most
+    `max_pending_chunks` ahead of the results. Use it as a context manager.
+    """
+
+    def __init__(self, processes=None, cache=None, max_pending_chunks=None, specialized=False):
+        self.processes = processes or cpu_count()
+        self.pool = worker_pool(cache, specialized=specialized, processes=self.processes)
+        self.max_pending_chunks = max_pending_chunks or 4 * self.processes
+        self.next_sweep_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def map_chunks(self, sweeps):
+        """
+        Simulate chunks of teams from several sweeps, yielding (sweep index, chunk key, teams, turns, tied) as
+        they finish, where `tied` is whether each team had a turn meter tie (see simulate()).
+
+        Args:
+            sweeps (Iterable[tuple]): (fixed characters, config lists, demon lord, runs to watch for ties or None,
+                chunks) per sweep, where `chunks` yields (chunk key, list of index tuples into the config lists)
+                pairs.
+        """
+        slots = threading.Semaphore(self.max_pending_chunks)
+        stopped = threading.Event()
+        tables = {}
+
+        # Runs on the pool's task feeding thread, which blocks here while too many chunks are pending
+        def tasks():
+            for sweep_index, (fixed_characters, config_lists, demon_lord, tie_runs, chunks) in enumerate(sweeps):
+                sweep_id = self.next_sweep_id
+                self.next_sweep_id += 1
+                tables[sweep_id] = (sweep_index, fixed_characters, config_lists)
+                pickled_tables = pickle.dumps((fixed_characters, config_lists, demon_lord, tie_runs))
+                for chunk_key, combinations in chunks:
+                    slots.acquire()
+                    if stopped.is_set():
+                        return
+                    yield sweep_id, pickled_tables, chunk_key, np.array(combinations, dtype=np.int32)
+
+        try:
+            for sweep_id, chunk_key, indices, turns, tied in self.pool.imap_unordered(
+                simulate_sweep_chunk_wrapper, tasks()
+            ):
+                slots.release()
+                sweep_index, fixed_characters, config_lists = tables[sweep_id]
+                teams = [
+                    fixed_characters + [configs[i] for configs, i in zip(config_lists, combination)]
+                    for combination in indices.tolist()
+                ]
+                yield sweep_index, chunk_key, teams, turns.tolist(), tied.tolist()
+        finally:
+            # Let the feeding thread finish if the results weren't all consumed
+            stopped.set()
+            for _ in range(self.max_pending_chunks):
+                slots.release()
+
+    def simulate(self, sweeps, chunk_size=256):
+        """
+        Simulate every team of several sweeps, yielding (sweep index, turns, team) as results come in.
+
+        Args:
+            sweeps (Iterable[tuple]): (fixed characters, config lists, demon lord, combinations) per sweep, where
+                `combinations` yields index tuples into the config lists. A single team can be run as
+                (team, [], demon lord, [()]).
+            chunk_size (int): Number of teams per chunk.
+        """
+        chunked_sweeps = (
+            (fixed_characters, config_lists, demon_lord, None, enumerate(chunked(combinations, chunk_size)))
+            for fixed_characters, config_lists, demon_lord, combinations in sweeps
+        )
+        for sweep_index, _, teams, turns, _ in self.map_chunks(chunked_sweeps):
+            for team, team_turns in zip(teams, turns):
+                yield sweep_index, team_turns, team
+
+
+def interchangeable_runs(base_characters):
+    """
+    Split characters into runs of consecutive characters with the same ability kit (never Donnie) and return the
+    run lengths.
+    """
+    runs = []
+    for i, character in enumerate(base_characters):
+        previous = base_characters[i - 1] if i > 0 else None
+        if (
+            previous is not None
+            and previous.abilities == character.abilities
+            and DONNIE.name not in (previous.name, character.name)
+        ):
+            runs[-1] += 1
+        else:
+            runs.append(1)
+    return runs
+
+
+def run_positions(runs, offset=0):
+    """
+    (start, end) team positions of the interchangeable_runs() of more than one character, which start at
+    `offset` in the team, to watch for turn meter ties (see simulate()); None if there are none.
+    """
+    positions = []
+    start = offset
+    for size in runs:
+        if size > 1:
+            positions.append((start, start + size))
+        start += size
+    return positions or None
+
+
+def canonical_index_combinations(config_lists, runs):
+    """Like canonical_combinations(), but yielding the index of each config in its list instead."""
+    run_combinations = []
+    start = 0
+    for size in runs:
+        run_combinations.append(list(itertools.combinations_with_replacement(range(len(config_lists[start])), size)))
+        start += size
+
+    for parts in itertools.product(*run_combinations):
+        yield tuple(itertools.chain(*parts))
+
+
+def canonical_combinations(config_lists, runs):
+    """
+    Like itertools.product(*config_lists), but only yields one ordering of configs within each run of
+    interchangeable characters (combinations with replacement).
+    """
+    for indices in canonical_index_combinations(config_lists, runs):
+        yield [configs[i] for configs, i in zip(config_lists, indices)]
+
+
+def count_canonical_combinations(config_lists, runs):
+    """Number of combinations canonical_combinations() yields."""
+    total = 1
+    start = 0
+    for size in runs:
+        total *= math.comb(len(config_lists[start]) + size - 1, size)
+        start += size
+    return total
+
+
+def permuted_teams(team, runs, offset=0):
+    """
+    Yield every other distinct team obtained by reordering configs within each run of interchangeable
+    characters, which start at `offset` in the team.
+    """
+    run_orderings = []
+    start = offset
+    for size in runs:
+        block = team[start : start + size]
+        orderings = {}
+        for ordering in itertools.permutations(block):
+            key = tuple(config_key(c) for c in ordering)
+            orderings.setdefault(key, ordering)
+        run_orderings.append(
+            [
+                [CharacterConfig(name=slot.name, speed=c.speed, abilities=c.abilities) for slot, c in zip(block, ordering)]
+                for ordering in orderings.values()
+            ]
+        )
+        start += size
+
+    for parts in itertools.product(*run_orderings):
+        permuted = team[:offset] + list(itertools.chain(*parts))
+        if any(p.speed != c.speed or p.abilities != c.abilities for p, c in zip(permuted, team)):
+            yield permuted
+
+
+def selection_key(fixed_characters):
+    """Key of a fixed selection, to look up things kept per selection by a team's first characters."""
+    return tuple(config_key(c) for c in fixed_characters)
+
+
+def fill_in_solutions(results, min_turns, class_lookups, num_variable, runs=None, simulate=None, timers=NO_TIMERS):
+    """
+    Yield (turns, team) for every team in `results` that gets to demon lord turn `min_turns`, and for every team
+    that only differs from it by equivalent configs or by the ordering of interchangeable characters.
+
+    Searches only simulate one config per class of equivalent configs and one ordering of interchangeable
+    characters. A reordering only plays out differently if one of the characters it moves was picked to move on an
+    exact turn meter tie with another of a different config. So the reorderings of every team that gets there and
+    of every team with such a tie, whether it gets there or not, are simulated with `simulate`.
+
+    Args:
+        results (Iterable[tuple]): (turns, team) pairs of the simulated teams, or (turns, team, tied) with whether
+            the fight had a tie in one of the runs (see run_positions()); teams without are taken to have none.
+        min_turns (int): Demon lord turn a team must get to.
+        class_lookups (list[dict] | Callable): Class lookups of the variable characters (see
+            equivalent_config_lists()), or a function returning them for a team.
+        num_variable (int): Number of variable characters, at the end of every team.
+        runs (list[int] | None): interchangeable_runs() of the variable characters, or None if `results` has every
+            ordering already.
+        simulate (Callable | None): Function simulating an iterable of teams, yielding (turns, team) pairs.
+        timers (PhaseTimers): Timers to add the time spent filling in to, as "result handling".
+    """
+    lookups = class_lookups if callable(class_lookups) else lambda team: class_lookups
+    found = []
+    for turns, team, *tied in results:
+        with timers.phase("result handling"):
+            solutions = []
+            if runs is not None and (reaches(turns, min_turns) or any(tied)):
+                found.append(team)
+            if reaches(turns, min_turns):
+                solutions = list(equivalent_teams(team, lookups(team), len(team) - num_variable))
+        for solution in solutions:
+            yield turns, solution
+
+    if not found:
+        return
+    permuted = (permuted for team in found for permuted in permuted_teams(team, runs, len(team) - num_variable))
+    for turns, team in simulate(permuted):
+        if reaches(turns, min_turns):
+            for solution in equivalent_teams(team, lookups(team), len(team) - num_variable):
+                yield turns, solution
+
+
+def _until(deadline, iterable):
+    """Iterate over `iterable` until time.monotonic() passes `deadline`, or to the end if it is None."""
+    iterator = iter(iterable)
+    while deadline is None or time.monotonic() <= deadline:
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item
+
+
+@dataclass
+class SearchResult:
+    """
+    A team found by search_configuration() or search_variable_configs().
+
+    Attributes:
+        turns (int | list[int]): The demon lord turn the team failed on, or the turn limit if it survived; one per
+            boss if the search was against several.
+        team (list[CharacterConfig]): The whole team, in team order.
+    """
+
+    turns: Union[int, List[int]]
+    team: List[CharacterConfig]
+
+
+def _search(
+    speed_range,
+    fixed_characters,
+    variable_characters,
+    demon_lord,
+    turn_limit,
+    store_description=None,
+    batch_size=None,
+    store=None,
+    cache=None,
+    chunk_size=256,
+    specialized=False,
+    grid_step=None,
+    instrument=False,
+    summary=None,
+    min_turns=None,
+    deadline=None,
+    progress=False,
+):
+    """
+    Simulate `fixed_characters` with every config of `variable_characters`, yielding (turns, team) for every team
+    that gets to demon lord turn `min_turns`. Arguments are those of run_variable_configs(); past `deadline` or
+    once closed, workers are terminated.
+    """
+    if isinstance(demon_lord, list) and (batch_size is not None or store is not None or grid_step is not None):
+        raise ValueError("Several bosses at once are only supported without batch_size, store and grid_step")
+    if grid_step is not None and (batch_size is not None or store is not None):
+        raise ValueError("The speed grid is only supported without batch_size and store")
+    if instrument and specialized:
+        raise ValueError("Specialized fights can't be instrumented")
+    if min_turns is None:
+        min_turns = turn_limit
+
+    config_lists, class_lookups = equivalent_config_lists(variable_characters, speed_range, fixed_characters)
+    runs = interchangeable_runs(variable_characters)
+    tie_runs = run_positions(runs, len(fixed_characters))
+
+    with InstrumentedRun(instrument) as run, worker_pool(
+        cache, (fixed_characters, config_lists, demon_lord, tie_runs), specialized, run.stats_sink
+    ) as pool:
+        timers = run.timers
+        # Teams are pulled by the pool's task handler thread, which chunks, pickles and sends them to the workers
+        # in between: that is "dispatch", waiting for room in the pipe to the workers included
+        teams = timers.between(
+            "dispatch",
+            timers.timed(
+                "generation", (fixed_characters + configs for configs in canonical_combinations(config_lists, runs))
+            ),
+        )
+        if grid_step is not None:
+            results = simulate_speed_bands(
+                pool, [(fixed_characters, config_lists)], demon_lord, turn_limit, grid_step, summary, runs
+            )
+        elif store is None and batch_size is None:
+            combinations = timers.between(
+                "dispatch", timers.timed("generation", canonical_index_combinations(config_lists, runs))
+            )
+            results = simulate_indexed_teams(pool, combinations, fixed_characters, config_lists, chunk_size)
+        elif store is None:
+            results = simulate_teams(pool, teams, demon_lord, batch_size, tie_runs)
+        else:
+            results = simulate_teams_resumable(
+                pool, store, store_description, teams, demon_lord, turn_limit, batch_size, tie_runs=tie_runs
+            )
+        if progress:
+            total = count_canonical_combinations(config_lists, runs) if grid_step is None else None
+            results = tqdm(results, total=total)
+
+        yield from fill_in_solutions(
+            _until(deadline, timers.timed("waiting for results", results)),
+            min_turns,
+            class_lookups,
+            len(variable_characters),
+            runs,
+            lambda teams: _until(deadline, simulate_teams(pool, teams, demon_lord, batch_size)),
+            timers,
+        )
+        if deadline is not None and time.monotonic() > deadline:
+            return
+
+        pool.close()
+        pool.join()
+
+
+def _search_results(results, where=None, max_results=None):
+    """Turn (turns, team) pairs from _search() into SearchResults that `where` accepts, up to `max_results`."""
+    # Closing _search() terminates the workers, also when the caller stops early
+    with contextlib.closing(results):
+        if max_results == 0:
+            return
+        num_results = 0
+        for turns, team in results:
+            result = SearchResult(turns=turns, team=team)
+            if where is not None and not where(result):
+                continue
+            yield result
+            num_results += 1
+            if num_results == max_results:
+                return
+
+
+def search_configuration(
+    speed_range,
+    base_characters,
+    demon_lord,
+    turn_limit,
+    batch_size=None,
+    cache=None,
+    chunk_size=256,
+    specialized=False,
+    min_turns=None,
+    where=None,
+    max_results=None,
+    time_budget=None,
+):
+    """
+    Search all possible configurations of a list of characters like run_configuration(), yielding a SearchResult
+    for every team found instead of printing it.
+
+    Args:
+        speed_range (tuple[int, int]): Speed search space.
+        base_characters (list[Character]): Characters to test.
+        demon_lord (CharacterConfig | list[CharacterConfig]): Boss configuration, or several to simulate every
+            team against in the same pass (not with batch_size, store or grid_step).
+        turn_limit (int): Maximum turns before forced stop.
+        batch_size (int | None): Simulate teams with simulate_batch() in chunks of this size.
+        cache (SimulationCache | None): Reuse results of teams simulated before.
+        chunk_size (int): Number of teams sent to a worker at once, without batch_size.
+        specialized (bool): Run fights generated for the team's roster shape, unless batch_size is set.
+        min_turns (int | None): Yield teams that get to this demon lord turn (against at least one boss) rather
+            than only the ones that survive to `turn_limit`.
+        where (Callable[[SearchResult], bool] | None): Only yield results this accepts.
+        max_results (int | None): Stop after yielding this many results.
+        time_budget (float | None): Stop after this many seconds, checked whenever a result comes in.
+
+    Yields:
+        SearchResult: Every team found, equivalent and reordered teams included; reorderings come last.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    results = _search(
+        speed_range,
+        [],
+        base_characters,
+        demon_lord,
+        turn_limit,
+        batch_size=batch_size,
+        cache=cache,
+        chunk_size=chunk_size,
+        specialized=specialized,
+        min_turns=min_turns,
+        deadline=deadline,
+    )
+    yield from _search_results(results, where, max_results)
+
+
+def search_variable_configs(
+    speed_range,
+    fixed_characters,
+    variable_characters,
+    demon_lord,
+    turn_limit,
+    batch_size=None,
+    cache=None,
+    chunk_size=256,
+    specialized=False,
+    min_turns=None,
+    where=None,
+    max_results=None,
+    time_budget=None,
+):
+    """
+    Search configurations of a subset of characters like run_variable_configs(), yielding a SearchResult for
+    every team found as workers finish. See search_configuration() for stopping early and the other arguments.
+
+    Args:
+        fixed_characters (list[CharacterConfig]): Characters locked to a specific setup.
+        variable_characters (list[Character]): Characters to explore.
+
+    Yields:
+        SearchResult: Every team found, fixed characters included.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    results = _search(
+        speed_range,
+        fixed_characters,
+        variable_characters,
+        demon_lord,
+        turn_limit,
+        batch_size=batch_size,
+        cache=cache,
+        chunk_size=chunk_size,
+        specialized=specialized,
+        min_turns=min_turns,
+        deadline=deadline,
+    )
+    yield from _search_results(results, where, max_results)
 
 
-def run_configuration(speed_range, base_characters, demon_lord, turn_limit):
+def run_configuration(
+    speed_range,
+    base_characters,
+    demon_lord,
+    turn_limit,
+    batch_size=None,
+    store=None,
+    cache=None,
+    chunk_size=256,
+    specialized=False,
+    grid_step=None,
+    instrument=False,
+):
     """
     Run exhaustive search across all possible configurations
     for a list of characters against a given boss.
@@ -60,63 +1041,806 @@ def run_configuration(speed_range, base_characters, demon_lord, turn_limit):
     Args:
         speed_range (tuple[int, int]): Speed search space.
         base_characters (list[Character]): Characters to test.
+        demon_lord (CharacterConfig | list[CharacterConfig]): Boss configuration, or several to simulate every
+            team against in the same pass (not with batch_size, store or grid_step). Teams that survive any of
+            them are printed with one result per boss.
+        turn_limit (int): Maximum turns before forced stop.
+        batch_size (int | None): Simulate teams with simulate_batch() in chunks of this size.
+        store (ResultStore | None): Keep results in this store, and resume the sweep if it was stopped.
+        cache (SimulationCache | None): Reuse results of teams simulated before.
+        chunk_size (int): Number of teams sent to a worker at once, without batch_size or store.
+        specialized (bool): Run fights generated for the team's roster shape, unless batch_size is set.
+        grid_step (int | None): Instead of simulating every team, search speeds coarse to fine from a grid with
+            this many speeds between grid lines, and print the surviving speed bands (see
+            adaptive_speed_search()). Not available with batch_size or store.
+        instrument (bool): Count what the fights do and time each phase of the run, in every worker, and print
+            a summary at the end (see InstrumentedRun). Fights run by simulate_batch() are only timed. Not
+            available with specialized.
+    """
+    store_description = None
+    if store is not None:
+        store_description = (
+            f"run_configuration: speed_range={tuple(speed_range)}, "
+            f"characters={[c.name for c in base_characters]}, demon_lord={team_to_json([demon_lord])}"
+        )
+    summary = {}
+    for turns, team in _search(
+        speed_range,
+        [],
+        base_characters,
+        demon_lord,
+        turn_limit,
+        store_description,
+        batch_size,
+        store,
+        cache,
+        chunk_size,
+        specialized,
+        grid_step,
+        instrument,
+        summary,
+        progress=True,
+    ):
+        print_solution(turns, team)
+
+    if grid_step is not None:
+        print_speed_bands(summary, 0)
+
+
+def reaches(turns, min_turns):
+    """Whether a team gets to demon lord turn `min_turns`, against at least one boss if `turns` has one per boss."""
+    return (max(turns) if isinstance(turns, list) else turns) >= min_turns
+
+
+def survives(turns, turn_limit):
+    """Whether a team survives to the turn limit, against at least one boss if `turns` has one result per boss."""
+    if isinstance(turns, list):
+        return turn_limit in turns
+    return turns == turn_limit
+
+
+def print_solution(turns, team):
+    print("\n!!! New Solution Found !!!")
+    print(f"Turns: {turns}")
+    for i, c in enumerate(team):
+        print(
+            f"\t{c.name}: speed={c.speed}, abilities={[a.ability.name for a in c.abilities]}, priorities={[a.priority for a in c.abilities]}, delays={[a.delay for a in c.abilities]}"
+        )
+    print("==========================")
+
+
+def print_speeds(turns, team):
+    print(f"Turns: {turns}, speeds: {[f'{c.name}: {c.speed}' for c in team]}")
+
+
+def variable_configs_description(speed_range, fixed_characters, variable_characters, demon_lord):
+    """Description of a run_variable_configs() sweep for a ResultStore."""
+    return (
+        f"run_variable_configs: speed_range={tuple(speed_range)}, fixed={team_to_json(fixed_characters)}, "
+        f"variable={[c.name for c in variable_characters]}, demon_lord={team_to_json([demon_lord])}"
+    )
+
+
+def run_variable_configs(
+    speed_range,
+    fixed_characters,
+    variable_characters,
+    demon_lord,
+    turn_limit,
+    batch_size=None,
+    store=None,
+    cache=None,
+    chunk_size=256,
+    specialized=False,
+    grid_step=None,
+    instrument=False,
+):
+    """
+    Run simulations varying only a subset of characters.
+
+    Args:
+        speed_range (tuple[int, int]): Speed search space.
+        fixed_characters (list[CharacterConfig]): Characters locked to a specific setup.
+        variable_characters (list[Character]): Characters to explore.
+        demon_lord (CharacterConfig | list[CharacterConfig]): Boss configuration, or several to simulate every
+            team against in the same pass (not with batch_size, store or grid_step). Teams that survive any of
+            them are printed with one result per boss.
+        turn_limit (int): Maximum turns before forced stop.
+        batch_size (int | None): Simulate teams with simulate_batch() in chunks of this size.
+        store (ResultStore | None): Keep results in this store, and resume the sweep if it was stopped.
+        cache (SimulationCache | None): Reuse results of teams simulated before.
+        chunk_size (int): Number of teams sent to a worker at once, without batch_size or store.
+        specialized (bool): Run fights generated for the team's roster shape, unless batch_size is set.
+        grid_step (int | None): Instead of simulating every team, search speeds coarse to fine from a grid with
+            this many speeds between grid lines, and print the surviving speed bands (see
+            adaptive_speed_search()). Not available with batch_size or store.
+        instrument (bool): Count what the fights do and time each phase of the run, in every worker, and print
+            a summary at the end (see InstrumentedRun). Fights run by simulate_batch() are only timed. Not
+            available with specialized.
+    """
+    store_description = None
+    # With a list of bosses, _search() rejects the store
+    if store is not None and not isinstance(demon_lord, list):
+        store_description = variable_configs_description(speed_range, fixed_characters, variable_characters, demon_lord)
+    summary = {}
+    for turns, team in _search(
+        speed_range,
+        fixed_characters,
+        variable_characters,
+        demon_lord,
+        turn_limit,
+        store_description,
+        batch_size,
+        store,
+        cache,
+        chunk_size,
+        specialized,
+        grid_step,
+        instrument,
+        summary,
+    ):
+        print_speeds(turns, team)
+
+    if grid_step is not None:
+        print_speed_bands(summary, len(fixed_characters))
+
+
+def run_variable_selections(
+    speed_range, fixed_selections, variable_characters, demon_lord, turn_limit, executor, store=None, chunk_size=256
+):
+    """
+    Like run_variable_configs(), for several fixed selections at once on a SearchExecutor, which keeps all of its
+    workers busy from one selection to the next.
+
+    Args:
+        speed_range (tuple[int, int]): Speed search space.
+        fixed_selections (list[list[CharacterConfig]]): Fixed setups to search variable characters for.
+        variable_characters (list[Character]): Characters to explore.
+        demon_lord (CharacterConfig | list[CharacterConfig]): Boss configuration, or several to simulate every
+            team against in the same pass (not with a store). Teams that survive any of them are printed with
+            one result per boss.
+        turn_limit (int): Maximum turns before forced stop.
+        executor (SearchExecutor): Workers to run on.
+        store (ResultStore | None): Keep results in this store, and resume selections that were stopped.
+        chunk_size (int): Number of teams sent to a worker at once, and per chunk in the store.
+    """
+    if isinstance(demon_lord, list) and store is not None:
+        raise ValueError("Several bosses at once are only supported without a store")
+
+    runs = interchangeable_runs(variable_characters)
+    selections = []
+    lookups = {}
+    for fixed_characters in fixed_selections:
+        config_lists, lookups[selection_key(fixed_characters)] = equivalent_config_lists(
+            variable_characters, speed_range, fixed_characters
+        )
+        if store is None:
+            sweep_id, done = None, {}
+        else:
+            description = variable_configs_description(speed_range, fixed_characters, variable_characters, demon_lord)
+            sweep_id = store.sweep(resumable_description(description, chunk_size), turn_limit)
+            done = store.done_chunks(sweep_id)
+        selections.append((fixed_characters, config_lists, sweep_id, done))
+
+    resumed = []
+
+    def chunks(selection_index):
+        fixed_characters, config_lists, _, done = selections[selection_index]
+        combinations = canonical_index_combinations(config_lists, runs)
+        for chunk_index, chunk in enumerate(chunked(combinations, chunk_size)):
+            if chunk_index in done:
+                for position, turns, tied in done[chunk_index]:
+                    team = fixed_characters + [configs[i] for configs, i in zip(config_lists, chunk[position])]
+                    resumed.append((turns, team, tied))
+            else:
+                yield chunk_index, chunk
+
+    def results():
+        sweeps = (
+            (fixed_characters, config_lists, demon_lord, run_positions(runs, len(fixed_characters)), chunks(i))
+            for i, (fixed_characters, config_lists, *_) in enumerate(selections)
+        )
+        total = sum(count_canonical_combinations(config_lists, runs) for _, config_lists, *_ in selections)
+        with tqdm(total=total) as progress:
+            for selection_index, chunk_index, teams, turns, tied in executor.map_chunks(sweeps):
+                if store is not None:
+                    store.add_chunk(selections[selection_index][2], chunk_index, teams, turns, tied)
+                yield from zip(turns, teams, tied)
+                progress.update(len(teams))
+        yield from resumed
+
+    def simulate_teams_on_executor(teams):
+        for _, turns, team in executor.simulate((team, [], demon_lord, [()]) for team in teams):
+            yield turns, team
+
+    num_variable = len(variable_characters)
+    for turns, team in fill_in_solutions(
+        results(),
+        turn_limit,
+        lambda team: lookups[selection_key(team[: len(team) - num_variable])],
+        num_variable,
+        runs,
+        simulate_teams_on_executor,
+    ):
+        print_speeds(turns, team)
+
+
+def sharded_sweep(store, speed_range, fixed_characters, variable_characters, demon_lord, turn_limit, shard_size):
+    """
+    Set up the sweep that run_sharded_configs() and report_sharded_configs() share, split into shards of
+    `shard_size` canonical_index_combinations().
+
+    Returns:
+        tuple: The sweep id in `store`, the number of shards, the config lists, the class lookups and the
+        interchangeable runs.
+    """
+    config_lists, class_lookups = equivalent_config_lists(variable_characters, speed_range, fixed_characters)
+    runs = interchangeable_runs(variable_characters)
+    description = variable_configs_description(speed_range, fixed_characters, variable_characters, demon_lord)
+    sweep_id = store.sweep(f"{description}, shard_size={shard_size}", turn_limit)
+    num_shards = math.ceil(count_canonical_combinations(config_lists, runs) / shard_size)
+    return sweep_id, num_shards, config_lists, class_lookups, runs
+
+
+def run_sharded_configs(
+    store_path,
+    speed_range,
+    fixed_characters,
+    variable_characters,
+    demon_lord,
+    turn_limit,
+    shard_size=100_000,
+    stale_after=3600,
+    specialized=False,
+):
+    """
+    Work through a run_variable_configs() sweep one shard at a time, together with any other process running this
+    with the same arguments on the same ResultStore file.
+
+    Args:
+        store_path (str): ResultStore file shared by every process.
+        speed_range (tuple[int, int]): Speed search space.
+        fixed_characters (list[CharacterConfig]): Characters locked to a specific setup.
+        variable_characters (list[Character]): Characters to explore.
         demon_lord (CharacterConfig): Boss configuration.
         turn_limit (int): Maximum turns before forced stop.
+        shard_size (int): Number of teams per shard. Must be the same for every process.
+        stale_after (float): Seconds after which a shard that isn't done can be claimed again.
+        specialized (bool): Run fights generated for the team's roster shape.
     """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    with ResultStore(store_path) as store:
+        sweep_id, num_shards, config_lists, _, runs = sharded_sweep(
+            store, speed_range, fixed_characters, variable_characters, demon_lord, turn_limit, shard_size
+        )
+        num_teams = count_canonical_combinations(config_lists, runs)
+        tie_runs = run_positions(runs, len(fixed_characters))
+        with worker_pool(None, (fixed_characters, config_lists, demon_lord, tie_runs), specialized) as pool:
+            while (shard := store.claim_chunk(sweep_id, num_shards, worker, stale_after)) is not None:
+                combinations = itertools.islice(
+                    canonical_index_combinations(config_lists, runs), shard * shard_size, (shard + 1) * shard_size
+                )
+                results = list(
+                    tqdm(
+                        simulate_indexed_teams(pool, combinations, fixed_characters, config_lists, ordered=True),
+                        desc=f"Shard {shard + 1}/{num_shards}",
+                        total=min(shard_size, num_teams - shard * shard_size),
+                    )
+                )
+                turns, teams, tied = map(list, zip(*results))
+                store.add_chunk(sweep_id, shard, teams, turns, tied)
+
+
+def report_sharded_configs(
+    store_path, speed_range, fixed_characters, variable_characters, demon_lord, turn_limit, shard_size=100_000
+):
+    """
+    Print the solutions of a sweep run with run_sharded_configs(), merged over every shard that is done. Takes
+    the same arguments.
+    """
+    with ResultStore(store_path) as store:
+        sweep_id, num_shards, config_lists, class_lookups, runs = sharded_sweep(
+            store, speed_range, fixed_characters, variable_characters, demon_lord, turn_limit, shard_size
+        )
+        done = store.done_chunks(sweep_id)
+        num_teams, num_survived = store.counts(sweep_id)
 
-    character_config_lists = [list(generate_character_configs(c, speed_range)) for c in base_characters]
-    all_combinations = itertools.product(*character_config_lists)
+    # Survivors and teams with a tie, whose reorderings are simulated as well, are found again by their index in
+    # the sweep
+    found = {
+        shard * shard_size + position: (turns, tied)
+        for shard, shard_results in done.items()
+        for position, turns, tied in shard_results
+        if turns == turn_limit or tied
+    }
+    solutions = []
+    for index, combination in enumerate(canonical_index_combinations(config_lists, runs)):
+        if index in found:
+            team = fixed_characters + [configs[i] for configs, i in zip(config_lists, combination)]
+            solutions.append((found[index][0], team, found[index][1]))
 
-    total = math.prod(len(cfgs) for cfgs in character_config_lists)
     with Pool(processes=cpu_count()) as pool:
-        for turns, team in tqdm(
-            pool.imap_unordered(
-                simulate_wrapper,
-                ((list(chars), demon_lord) for chars in all_combinations),
-            ),
-            total=total,
+        for turns, solution in fill_in_solutions(
+            solutions,
+            turn_limit,
+            class_lookups,
+            len(variable_characters),
+            runs,
+            lambda teams: simulate_teams(pool, teams, demon_lord),
         ):
-            if turns == turn_limit:
-                print("\n!!! New Solution Found !!!")
-                print(f"Turns: {turns}")
-                for i, c in enumerate(team):
-                    print(
-                        f"\t{c.name}: speed={c.speed}, abilities={[a.ability.name for a in c.abilities]}, priorities={[a.priority for a in c.abilities]}, delays={[a.delay for a in c.abilities]}"
-                    )
-                print("==========================")
+            print_speeds(turns, solution)
+    print(f"{len(done)} of {num_shards} shards done, {num_survived} of {num_teams} simulated teams survived")
 
 
-def run_variable_configs(speed_range, fixed_characters, variable_characters, demon_lord, turn_limit):
+def run_variable_speeds(speed_range, fixed_selections, variable_characters, demon_lord, turn_limit):
     """
-    Run simulations varying only a subset of characters.
+    Like run_variable_configs(), for several fixed selections at once, simulating all speeds of the variable
+    characters together with simulate_variants().
 
     Args:
         speed_range (tuple[int, int]): Speed search space.
-        fixed_characters (list[CharacterConfig]): Characters locked to a specific setup.
+        fixed_selections (list[list[CharacterConfig]]): Fixed setups to search variable characters for.
         variable_characters (list[Character]): Characters to explore.
         demon_lord (CharacterConfig): Boss configuration.
         turn_limit (int): Maximum turns before forced stop.
     """
+    runs = interchangeable_runs(variable_characters)
+    num_variable = len(variable_characters)
+    tasks = []
+    lookups = {}
+    for fixed_characters in fixed_selections:
+        config_lists, lookups[selection_key(fixed_characters)] = equivalent_config_lists(
+            variable_characters, speed_range, fixed_characters
+        )
+        speed_groups = {}
+        for configs in canonical_combinations(config_lists, runs):
+            key = tuple(config_key(c)[1] for c in configs)
+            speed_groups.setdefault(key, (configs, []))[1].append([c.speed for c in configs])
+        tie_runs = run_positions(runs, len(fixed_characters))
+        for configs, variant_speeds in speed_groups.values():
+            tasks.append((fixed_characters + configs, demon_lord, variant_speeds, tie_runs))
+
+    with Pool(processes=cpu_count()) as pool:
+
+        def solutions():
+            for results, team, variant_speeds, tied in tqdm(
+                pool.imap(simulate_variants_wrapper, tasks), total=len(tasks)
+            ):
+                num_fixed = len(team) - num_variable
+                for turns, speeds, team_tied in zip(results, variant_speeds, tied):
+                    if turns == turn_limit or team_tied:
+                        yield turns, team[:num_fixed] + [
+                            CharacterConfig(name=c.name, speed=speed, abilities=c.abilities)
+                            for c, speed in zip(team[num_fixed:], speeds)
+                        ], team_tied
+
+        for turns, team in fill_in_solutions(
+            solutions(),
+            turn_limit,
+            lambda team: lookups[selection_key(team[: len(team) - num_variable])],
+            num_variable,
+            runs,
+            lambda teams: pool.imap(simulate_wrapper, ((team, demon_lord) for team in teams)),
+        ):
+            print_speeds(turns, team)
+
+
+def run_speed_bands(
+    speed_range, fixed_selections, variable_characters, demon_lord, turn_limit, grid_step=16, specialized=False
+):
+    """
+    Like run_variable_speeds(), but searching speeds coarse to fine with adaptive_speed_search() instead of
+    simulating every one, and printing the surviving speed bands as well as the solutions.
+
+    Args:
+        speed_range (tuple[int, int]): Speed search space.
+        fixed_selections (list[list[CharacterConfig]]): Fixed setups to search variable characters for.
+        variable_characters (list[Character]): Characters to explore.
+        demon_lord (CharacterConfig): Boss configuration.
+        turn_limit (int): Maximum turns before forced stop.
+        grid_step (int): Number of speeds between lines of the starting grid.
+        specialized (bool): Run fights generated for the team's roster shape.
+    """
+    num_variable = len(variable_characters)
+    selections = []
+    lookups = {}
+    for fixed_characters in fixed_selections:
+        config_lists, lookups[selection_key(fixed_characters)] = equivalent_config_lists(
+            variable_characters, speed_range, fixed_characters
+        )
+        selections.append((fixed_characters, config_lists))
+
+    summary = {}
+    runs = interchangeable_runs(variable_characters)
+    with worker_pool(specialized=specialized) as pool:
+        for turns, team in fill_in_solutions(
+            simulate_speed_bands(pool, selections, demon_lord, turn_limit, grid_step, summary, runs),
+            turn_limit,
+            lambda team: lookups[selection_key(team[: len(team) - num_variable])],
+            num_variable,
+            runs,
+            lambda teams: simulate_teams(pool, teams, demon_lord),
+        ):
+            print_speeds(turns, team)
+    print_speed_bands(summary, 0)
+
+
+@dataclass
+class SpeedRobustness:
+    """
+    How a working team holds up when its speeds are a little off, e.g. from hidden decimals (see
+    speed_robustness()).
+
+    Attributes:
+        jitter (list[float]): Largest amount every character's speed was moved by, either way.
+        survival_probability (float): Share of the samples with every character's speed moved at once that
+            survived.
+        failure_turns (dict[int, int]): Those samples that failed, by the demon lord turn they failed on.
+        solo_survival_probability (list[float]): Per character, share of the samples with only its speed moved
+            that survived; 1 for characters without jitter.
+        solo_failure_offsets (list[tuple[float, float]]): Per character, the offsets closest to 0 below and
+            above its speed that failed with only its speed moved, nan if none did.
+    """
+
+    jitter: List[float]
+    survival_probability: float
+    failure_turns: Dict[int, int]
+    solo_survival_probability: List[float]
+    solo_failure_offsets: List[Tuple[float, float]]
+
+
+def speed_robustness(pool, characters, demon_lord, jitter, samples=10_000, seed=0, chunk_size=500):
+    """
+    Estimate how likely a team is to still work with every speed off by up to `jitter`, and which character's
+    speed the failures come from.
+
+    Args:
+        pool (Pool): Worker pool to run on.
+        characters (list[CharacterConfig]): The team, in team order.
+        demon_lord (CharacterConfig): Boss configuration.
+        jitter (float | list[float]): Largest amount speeds are moved by, for every character or per character
+            (0 to keep one exact).
+        samples (int): Number of random speed settings, for all characters at once and for each on its own.
+        seed (int): Seed of the random speeds, so a run can be repeated.
+        chunk_size (int): Number of speed settings per task.
+
+    Returns:
+        SpeedRobustness: Survival probabilities and where the failures start.
+    """
+    jitter = np.broadcast_to(np.asarray(jitter, dtype=np.float64), (len(characters),)).copy()
+    rng = np.random.default_rng(seed)
+    jittered = [i for i, amount in enumerate(jitter) if amount > 0]
+
+    # All characters moved at once first, then every jittered character on its own
+    offsets = [rng.uniform(-jitter, jitter, size=(samples, len(characters)))]
+    for i in jittered:
+        solo = np.zeros((samples, len(characters)))
+        solo[:, i] = rng.uniform(-jitter[i], jitter[i], size=samples)
+        offsets.append(solo)
+    offsets = np.concatenate(offsets)
+    speeds = np.array([c.speed for c in characters], dtype=np.float64) + offsets
+
+    tasks = (
+        (characters, demon_lord, speeds[start : start + chunk_size]) for start in range(0, len(speeds), chunk_size)
+    )
+    turns = np.concatenate(list(pool.imap(simulate_speed_samples_wrapper, tasks)))
+    survived = turns == DEMON_LORD_TURN_LIMIT
+
+    failure_turns = Counter(turns[:samples][~survived[:samples]].tolist())
+    solo_survival_probability = [1.0] * len(characters)
+    solo_failure_offsets = [(math.nan, math.nan)] * len(characters)
+    for block, i in enumerate(jittered, start=1):
+        rows = slice(block * samples, (block + 1) * samples)
+        solo_survival_probability[i] = float(survived[rows].mean())
+        failed_offsets = offsets[rows, i][~survived[rows]]
+        below, above = failed_offsets[failed_offsets < 0], failed_offsets[failed_offsets >= 0]
+        solo_failure_offsets[i] = (
+            float(below.max()) if len(below) else math.nan,
+            float(above.min()) if len(above) else math.nan,
+        )
+
+    return SpeedRobustness(
+        jitter=jitter.tolist(),
+        survival_probability=float(survived[:samples].mean()),
+        failure_turns=dict(sorted(failure_turns.items())),
+        solo_survival_probability=solo_survival_probability,
+        solo_failure_offsets=solo_failure_offsets,
+    )
+
+
+def print_speed_robustness(robustness, characters):
+    """Print a SpeedRobustness of `characters`."""
+    print(f"Survives {robustness.survival_probability:.1%} of samples with every speed off at once")
+    if robustness.failure_turns:
+        print(f"Failures by demon lord turn: {robustness.failure_turns}")
+    for c, amount, probability, (below, above) in zip(
+        characters, robustness.jitter, robustness.solo_survival_probability, robustness.solo_failure_offsets
+    ):
+        if amount == 0:
+            continue
+        line = f"\t{c.name} ({c.speed} +/- {amount}): survives {probability:.1%} with only its speed off"
+        closest_failures = [f"{offset:+.3f}" for offset in (below, above) if not math.isnan(offset)]
+        if closest_failures:
+            line += f", closest failures at {' and '.join(closest_failures)}"
+        print(line)
+
+
+def bisect_speeds(characters, demon_lord, configs, tie_runs=None):
+    """
+    Search the configs of one more character that only differ in speed, sorted by speed, behind `characters`,
+    bisecting ranges of speeds until the team plays out the same at both ends.
+
+    With `tie_runs` (see simulate()), which must not include the last character, whether each fight had a turn
+    meter tie is returned as well. Where the fight plays out the same at both ends, so do the turn meters of the
+    other characters, so teams in between have a tie if the ends do.
+
+    Returns:
+        tuple[list[tuple], int, int]: Every config with the result simulate() would give for it, and whether
+        there was a tie with `tie_runs`; and how many configs were simulated and pruned.
+    """
+    fights = {0: fight_until_failure(characters + [configs[0]], demon_lord, tie_runs=tie_runs)}
+    stack = []
+    if len(configs) > 1:
+        fights[len(configs) - 1] = fight_until_failure(characters + [configs[-1]], demon_lord, tie_runs=tie_runs)
+        stack.append((0, len(configs) - 1))
+
+    pruned = 0
+    results = {}
+    while stack:
+        a, b = stack.pop()
+        if b - a <= 1:
+            continue
+        if fights[a][0] == fights[b][0]:
+            for i in range(a + 1, b):
+                results[i] = fights[a][1:]
+            pruned += b - a - 1
+            continue
+        middle = (a + b) // 2
+        fights[middle] = fight_until_failure(characters + [configs[middle]], demon_lord, tie_runs=tie_runs)
+        stack.append((a, middle))
+        stack.append((middle, b))
+
+    for i, fight in fights.items():
+        results[i] = fight[1:]
+    return [(configs[i], *results[i]) for i in range(len(configs))], len(fights), pruned
+
+
+def branch_and_bound_wrapper(args):
+    """
+    Wrapper to run bisect_speeds() on every group of configs of the last character behind one team. Returns
+    (team, turns, tied) for every team, and how many were simulated and pruned.
+    """
+    characters, config_groups, demon_lord, tie_runs = args
+    results = []
+    simulated = pruned = 0
+    for configs in config_groups:
+        group_results, group_simulated, group_pruned = bisect_speeds(characters, demon_lord, configs, tie_runs)
+        results.extend((characters + [config], turns, *tied) for config, turns, *tied in group_results)
+        simulated += group_simulated
+        pruned += group_pruned
+    return results, simulated, pruned
 
-    # Generate config sets for all variable chars
-    variable_config_lists = [list(generate_character_configs(c, speed_range)) for c in variable_characters]
-    all_combinations = itertools.product(*variable_config_lists)
 
+def run_branch_and_bound(speed_range, base_characters, demon_lord, turn_limit):
+    """
+    Like run_configuration(), but pruning ranges of speeds of the last character with bisect_speeds().
+
+    Args:
+        speed_range (tuple[int, int]): Speed search space.
+        base_characters (list[Character]): Characters to test.
+        demon_lord (CharacterConfig): Boss configuration.
+        turn_limit (int): Maximum turns before forced stop.
+    """
+    config_lists, class_lookups = equivalent_config_lists(base_characters, speed_range)
+    runs = interchangeable_runs(base_characters[:-1])
+
+    config_groups = speed_config_groups(config_lists[-1])
+    tie_runs = run_positions(runs)
+    tasks = (
+        (team, config_groups, demon_lord, tie_runs) for team in canonical_combinations(config_lists[:-1], runs)
+    )
+    total = count_canonical_combinations(config_lists[:-1], runs)
+    simulated = pruned = 0
     with Pool(processes=cpu_count()) as pool:
-        for turns, team in pool.imap_unordered(
-            simulate_wrapper,
-            ((fixed_characters + list(vars_), demon_lord) for vars_ in all_combinations),
+
+        def results():
+            nonlocal simulated, pruned
+            for task_results, task_simulated, task_pruned in tqdm(
+                pool.imap_unordered(branch_and_bound_wrapper, tasks), total=total
+            ):
+                simulated += task_simulated
+                pruned += task_pruned
+                for team, turns, *tied in task_results:
+                    yield turns, team, *tied
+
+        for turns, solution in fill_in_solutions(
+            results(),
+            turn_limit,
+            class_lookups,
+            len(base_characters),
+            runs,
+            lambda teams: simulate_teams(pool, teams, demon_lord),
         ):
-            if turns == turn_limit:
-                var_speeds = [f"{c.name}: {c.speed}" for c in team]
-                print(f"Turns: {turns}, speeds: {var_speeds}")
+            print_solution(turns, solution)
+
+    print(f"Simulated {simulated} teams, pruned {pruned}")
+
+
+def speed_config_groups(configs):
+    """Split configs of one character into groups that only differ in speed, each sorted by speed."""
+    groups = {}
+    for config in configs:
+        groups.setdefault(config_key(config)[1], []).append(config)
+    groups = sorted(groups.values(), key=lambda group: group[0].speed)
+    for group in groups:
+        group.sort(key=lambda c: c.speed)
+    return groups
+
+
+def interchangeable_blocks(config_groups, runs=None):
+    """
+    Split config groups into (start, end) blocks of interchangeable characters with the same group, whose speeds
+    can be reordered without changing the team beyond who wins a tie.
+    """
+    blocks = []
+    start = 0
+    for size in runs or [1] * len(config_groups):
+        for i in range(start, start + size):
+            if i > start and config_key(config_groups[i][0])[1] == config_key(config_groups[i - 1][0])[1]:
+                blocks[-1][1] = i + 1
+            else:
+                blocks.append([i, i + 1])
+        start += size
+    return blocks
+
+
+def adaptive_speed_search(characters, demon_lord, config_groups, grid_step, turn_limit, runs=None):
+    """
+    Search the speeds of several more characters behind `characters` coarse to fine for the teams that survive to
+    `turn_limit`, from a grid with `grid_step` configs between grid lines. `config_groups` has configs of each
+    that only differ in speed, sorted by speed, and `runs` are their interchangeable_runs().
+
+    A box of speeds (one range of indices into each group) is settled once the team plays out the same up to its
+    failure (see fight_until_failure()) at all of the box's corners. A fight that is the same at both ends of a
+    range of one character's speeds is the same everywhere in between (see survival_intervals()), so going along
+    one edge at a time, it is the same at every speed in the box. Boxes whose corners disagree are split along
+    their widest side, down to neighbouring speeds, so every team gets the result simulate() would give it. Of
+    interchangeable characters with the same group, only speeds in increasing order are searched.
+
+    Fights are also watched for turn meter ties between interchangeable characters (see simulate()), and only
+    boxes without one at any corner are settled. Where the fight plays out the same, turn meters follow speeds
+    linearly: a tie inside a box is a tie all along the side of the box it lies on, so it shows at that side's
+    corners, unless the two characters have the same config all along it and reordering them changes nothing.
+
+    Returns:
+        tuple[list[tuple[tuple[int, ...], int, int]], dict[tuple[int, ...], int], int]: The surviving bands as
+        index into every group but the last, and lowest and highest index into the last group; the index into
+        every group of each team with a tie, with its result; and how many teams were simulated.
+    """
+    blocks = interchangeable_blocks(config_groups, runs)
+    tie_runs = run_positions(runs, len(characters)) if runs is not None else None
+
+    def in_order(point):
+        return all(point[i - 1] <= point[i] for a, b in blocks for i in range(a + 1, b))
+
+    fights = {}
+
+    def fight(point):
+        if point not in fights:
+            team = characters + [group[i] for group, i in zip(config_groups, point)]
+            result = fight_until_failure(team, demon_lord, _specialized, tie_runs)
+            fights[point] = result if tie_runs is not None else (*result, False)
+        return fights[point]
+
+    def points(box):
+        return (point for point in itertools.product(*(range(a, b + 1) for a, b in box)) if in_order(point))
+
+    grids = [sorted(set(range(0, len(group), grid_step)) | {len(group) - 1}) for group in config_groups]
+    stack = list(
+        itertools.product(*([(a, b) for a, b in zip(grid, grid[1:])] or [(grid[0], grid[0])] for grid in grids))
+    )
+    surviving = set()
+    ties = {}
+    while stack:
+        box = stack.pop()
+        if any(box[i - 1][0] > box[i][1] for a, b in blocks for i in range(a + 1, b)):
+            # Only has reorderings of teams in other boxes
+            continue
+        # Corners out of order are simulated as they are: the box is settled on the fights at its actual corners
+        corners = [fight(corner) for corner in itertools.product(*box)]
+        if all(turns == corners[0][0] and not tied for turns, _, tied in corners):
+            if corners[0][1] == turn_limit:
+                surviving.update(points(box))
+            continue
+        widest = max(range(len(box)), key=lambda d: box[d][1] - box[d][0])
+        a, b = box[widest]
+        if b - a <= 1:
+            # Every team in the box is one of its corners
+            for point in points(box):
+                _, result, tied = fight(point)
+                if result == turn_limit:
+                    surviving.add(point)
+                if tied:
+                    ties[point] = result
+            continue
+        middle = (a + b) // 2
+        stack.append(box[:widest] + ((a, middle),) + box[widest + 1 :])
+        stack.append(box[:widest] + ((middle, b),) + box[widest + 1 :])
+
+    bands = []
+    for point in sorted(surviving):
+        prefix, i = point[:-1], point[-1]
+        if bands and bands[-1][0] == prefix and bands[-1][2] >= i - 1:
+            bands[-1][2] = i
+        else:
+            bands.append([prefix, i, i])
+    return [tuple(band) for band in bands], ties, len(fights)
+
+
+def adaptive_search_wrapper(args):
+    """
+    Wrapper to run adaptive_speed_search() for one combination of config groups.
+
+    Returns:
+        tuple: The fixed characters, the config groups, the surviving bands, the teams with a tie, how many teams
+        were simulated and how many teams in one ordering of interchangeable characters the groups have.
+    """
+    characters, config_groups, demon_lord, turn_limit, grid_step, runs = args
+    bands, ties, simulated = adaptive_speed_search(characters, demon_lord, config_groups, grid_step, turn_limit, runs)
+    total = math.prod(
+        math.comb(len(config_groups[a]) + b - a - 1, b - a) for a, b in interchangeable_blocks(config_groups, runs)
+    )
+    return characters, config_groups, bands, ties, simulated, total
+
+
+def simulate_speed_bands(pool, selections, demon_lord, turn_limit, grid_step, summary, runs=None):
+    """
+    Search speeds with adaptive_speed_search() for each of `selections` (fixed characters, config lists), yielding
+    (turns, team, tied) for every team that survives or has a turn meter tie (see fill_in_solutions()) and filling
+    in `summary` for print_speed_bands(). `runs` are the interchangeable_runs() of the characters of the config
+    lists; only one ordering of them is searched.
+    """
+    tasks = (
+        (fixed_characters, list(config_groups), demon_lord, turn_limit, grid_step, runs)
+        for fixed_characters, config_lists in selections
+        for config_groups in canonical_combinations(
+            [speed_config_groups(configs) for configs in config_lists], runs or [1] * len(config_lists)
+        )
+    )
+    summary.update(bands=[], simulated=0, total=0)
+    for characters, config_groups, bands, ties, simulated, total in pool.imap(adaptive_search_wrapper, tasks):
+        summary["simulated"] += simulated
+        summary["total"] += total
+
+        def team(point):
+            return characters + [group[j] for group, j in zip(config_groups, point)]
+
+        for prefix, low, high in bands:
+            for i in range(low, high + 1):
+                yield turn_limit, team(prefix + (i,)), prefix + (i,) in ties
+            summary["bands"].append((team(prefix + (low,)), team(prefix + (high,))))
+        for point, turns in ties.items():
+            if turns != turn_limit:
+                yield turns, team(point), True
+
+
+def print_speed_bands(summary, num_fixed):
+    """Print the bands and counts simulate_speed_bands() left in `summary`, from the character at `num_fixed` on."""
+    for low, high in summary["bands"]:
+        band = []
+        for c, speeds in zip(low, [c.speed for c in low[:-1]] + [f"{low[-1].speed}-{high[-1].speed}"]):
+            if len(c.abilities) > 1:
+                speeds = f"{speeds} (priorities={[a.priority for a in c.abilities]}, delays={[a.delay for a in c.abilities]})"
+            band.append(f"{c.name}: {speeds}")
+        print(f"Band: {band[num_fixed:]}")
+    print(f"Simulated {summary['simulated']} of {summary['total']} teams")
 
 
 def run_all():
     """Exhaustively explore all configs for Demytha + Donnie against UNM Demon Lord."""
 
     speed_range = (150, 300)
-    run_configuration(
+    run_branch_and_bound(
         speed_range,
         [
             DEMYTHA,
@@ -148,8 +1872,16 @@ def run_some():
     )
 
 
-def run_some_selections():
-    """Explore multiple fixed Demytha/Donnie speed selections with DPS variations."""
+def run_some_selections(results_path=None, cache_path=None):
+    """
+    Explore multiple fixed Demytha/Donnie speed selections with DPS variations.
+
+    Args:
+        results_path (str | None): SQLite file to keep results in. Running again with the same file skips
+            everything that was already simulated.
+        cache_path (str | None): SQLite file to cache simulate() results in, so later searches that overlap
+            with this one only simulate new teams.
+    """
 
     demytha_speeds = [254, 283]
     donnie_speeds = [184, 189]
@@ -165,14 +1897,20 @@ def run_some_selections():
                 ]
             )
 
-    for fixed_selection in tqdm(fixed):
-        run_variable_configs(
+    store = ResultStore(results_path) if results_path is not None else None
+    cache = SimulationCache(cache_path) if cache_path is not None else None
+    with SearchExecutor(cache=cache, specialized=True) as executor:
+        run_variable_selections(
             (speed_range[0], speed_range[1] + 1),
-            fixed_selection,
+            fixed,
             [DPS_1, DPS_2, DPS_3],
             DEMON_LORD_UNM,
             DEMON_LORD_TURN_LIMIT,
+            executor,
+            store=store,
         )
+    if store is not None:
+        store.close()
 
 
 def run_some_selections_fast():
@@ -193,14 +1931,71 @@ def run_some_selections_fast():
                 ]
             )
 
-    for fixed_selection in tqdm(fixed):
-        run_variable_configs(
-            (speed_range[0], speed_range[1] + 1),
-            fixed_selection,
-            [DPS_3],
-            DEMON_LORD_UNM,
-            DEMON_LORD_TURN_LIMIT,
-        )
+    run_speed_bands(
+        (speed_range[0], speed_range[1] + 1),
+        fixed,
+        [DPS_3],
+        DEMON_LORD_UNM,
+        DEMON_LORD_TURN_LIMIT,
+        specialized=True,
+    )
+
+
+def run_speed_intervals():
+    """Print the exact speeds each character of a fixed tune can have while the others stay as they are."""
+
+    team = [
+        DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+        DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+        DPS_1.to_config(speed=270, priorities=[1]),
+        DPS_2.to_config(speed=268, priorities=[1]),
+        DPS_3.to_config(speed=110, priorities=[1]),
+    ]
+
+    for i, character in enumerate(team):
+        intervals = survival_intervals(team, DEMON_LORD_UNM, i, (100, 350))
+        print(f"{character.name}: {[f'{low:.3f}-{high:.3f}' for low, high in intervals]}")
+
+
+def run_speed_robustness():
+    """Print how likely a fixed tune is to still work with hidden speed decimals, and whose speed it hinges on."""
+
+    team = [
+        DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+        DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+        DPS_1.to_config(speed=181, priorities=[1]),
+        DPS_2.to_config(speed=184, priorities=[1]),
+        DPS_3.to_config(speed=189, priorities=[1]),
+    ]
+
+    with Pool(processes=cpu_count()) as pool:
+        robustness = speed_robustness(pool, team, DEMON_LORD_UNM, jitter=0.5)
+    print_speed_robustness(robustness, team)
+
+
+def run_fixed_point_check():
+    """Check that the fixed-point engine agrees with the float engine over a Demytha + Donnie sweep."""
+
+    speed_range = (240, 280)
+    config_lists = [
+        list(generate_character_configs(DEMYTHA, speed_range)),
+        list(generate_character_configs(DONNIE_MINE, (170, 200))),
+    ]
+    teams = itertools.product(*config_lists)
+    total = math.prod(len(configs) for configs in config_lists)
+
+    mismatches = 0
+    with Pool(processes=cpu_count()) as pool:
+        for float_turns, fixed_point_turns, team in tqdm(
+            pool.imap_unordered(fixed_point_check_wrapper, ((list(team), DEMON_LORD_UNM) for team in teams), chunksize=64),
+            total=total,
+        ):
+            if float_turns != fixed_point_turns:
+                mismatches += 1
+                configs = [f"{c.name}: {c.speed} {[(a.priority, a.delay) for a in c.abilities]}" for c in team]
+                print(f"Float: {float_turns}, fixed-point: {fixed_point_turns}, configs: {configs}")
+
+    print(f"{mismatches} of {total} teams differ between the float and fixed-point engines")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,14 @@
 import itertools
-import uuid
-from copy import deepcopy
-from typing import List
+import math
+from functools import partial
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 from tqdm import tqdm
 
 from characters import (
+    AbilityConfig,
     CharacterConfig,
     DEMYTHA,
     HEIRESS,
@@ -20,261 +23,1617 @@ from characters import (
     DEMON_LORD_NM,
     DONNIE_MINE,
 )
+from abilities import Ability
 from effects import BuffType, DebuffType, Buff, Debuff, Effect, BuffTarget
 from raid_cb_simulator.abilities import DEMON_LORD_A1
+from traces import EXTRA_TURN, FAILED, TraceRecorder
 
 # Source: https://www.reddit.com/r/RaidShadowLegends/comments/15ktu28/how_does_turn_meter_works/
 TURN_METER_TICK_MULTIPLIER = 0.07
 
 DEMON_LORD_TURN_LIMIT = 50
 
+# Part of every SimulationCache key: bump it whenever a change can make simulate() return something else
+ENGINE_VERSION = 2
+
+# Safety margin used by the event-driven engine when predicting on which tick turn meter crosses 100
+TURN_METER_TOLERANCE = 1e-6
+
+# Fixed-point mode: speed is rounded to the nearest thousandth (ties to even) and turn meter is counted in
+# units of 1 / FIXED_POINT_TURN_METER_SCALE. The scale makes a tick's gain (speed * 0.07, times 13/10 with a
+# speed buff and 17/20 with a speed debuff) a whole number, so nothing else is ever rounded.
+FIXED_POINT_SPEED_SCALE = 1000
+FIXED_POINT_TURN_METER_SCALE = 20_000_000
+
+
+# Buff/debuff types in the order their durations are stored on CharacterState
+BUFF_INDICES = {buff_type: i for i, buff_type in enumerate(BuffType)}
+DEBUFF_INDICES = {debuff_type: i for i, debuff_type in enumerate(DebuffType)}
+INCREASE_SPEED_30_INDEX = BUFF_INDICES[BuffType.INCREASE_SPEED_30]
+BLOCK_DAMAGE_INDEX = BUFF_INDICES[BuffType.BLOCK_DAMAGE]
+DECREASE_SPEED_15_INDEX = DEBUFF_INDICES[DebuffType.DECREASE_SPEED_15]
+
 
 class CharacterState:
-    def __init__(self, character_config: CharacterConfig):
+    __slots__ = (
+        "character_config",
+        "id",
+        "is_demon_lord",
+        "is_donnie",
+        "fixed_point",
+        "turn_meter_unit",
+        "speed_units",
+        "ability_cooldowns",
+        "ability_delays",
+        "turn_meter",
+        "buff_durations",
+        "debuff_durations",
+        "donnies_passive_cooldown",
+        "friendly_entities",
+        "enemy_entities",
+        "buff_targets",
+        "debuff_targets",
+    )
+
+    def __init__(self, character_config: CharacterConfig, index: int, fixed_point: bool = False):
         self.character_config = character_config
-        self.id = str(uuid.uuid4())[:7]
+        # Position in the fight's entity list: team order, demon lord last
+        self.id = index
+        self.is_demon_lord = character_config.name == DEMON_LORD.name
+        self.is_donnie = character_config.name == DONNIE.name
+        self.fixed_point = fixed_point
+        # Turn meter units per point of turn meter
+        self.turn_meter_unit = FIXED_POINT_TURN_METER_SCALE if fixed_point else 1
+        self.speed_units = round(character_config.speed * FIXED_POINT_SPEED_SCALE) if fixed_point else None
         self.ability_cooldowns: List[int] = [0 for _ in character_config.abilities]
         self.ability_delays: List[int] = [ability.delay for ability in character_config.abilities]
         self.turn_meter: float = 0
-        self.buffs: List[Buff] = []
-        self.debuffs: List[Debuff] = []
+        # Remaining duration of every buff/debuff type, indexed by BUFF_INDICES/DEBUFF_INDICES; 0 if absent
+        self.buff_durations: List[int] = [0] * len(BUFF_INDICES)
+        self.debuff_durations: List[int] = [0] * len(DEBUFF_INDICES)
         self.donnies_passive_cooldown = 0
-
-    @property
-    def is_demon_lord(self) -> bool:
-        return self.character_config.name == DEMON_LORD.name
+        # Set by _create_entities()
+        self.friendly_entities: List[CharacterState] = []
+        self.enemy_entities: List[CharacterState] = []
+        # Who this entity's buffs and debuffs land on: champions buff the team and debuff themselves, the
+        # demon lord buffs itself and debuffs the team
+        self.buff_targets: List[CharacterState] = []
+        self.debuff_targets: List[CharacterState] = []
 
     @property
     def uid(self) -> str:
         return f"{self.character_config.name}-{self.id}"
 
-    def remove_expired_buffs_and_debuffs(self):
-        self.buffs = [b for b in self.buffs if b.duration > 0]
-        self.debuffs = [d for d in self.debuffs if d.duration > 0]
+    @property
+    def buffs(self) -> List[Buff]:
+        return [Buff(buff_type, d) for buff_type, d in zip(BUFF_INDICES, self.buff_durations) if d > 0]
+
+    @property
+    def debuffs(self) -> List[Debuff]:
+        return [Debuff(debuff_type, d) for debuff_type, d in zip(DEBUFF_INDICES, self.debuff_durations) if d > 0]
+
+
+def _create_entities(
+    characters: List[CharacterConfig], demon_lord: CharacterConfig, fixed_point: bool = False
+) -> List[CharacterState]:
+    """Create the states of everyone in the fight, in team order with the demon lord last."""
+    champions = [CharacterState(character, i, fixed_point) for i, character in enumerate(characters)]
+    demon_lord_entity = CharacterState(demon_lord, len(characters), fixed_point)
+
+    for champion in champions:
+        champion.friendly_entities = champions
+        champion.enemy_entities = [demon_lord_entity]
+        champion.buff_targets = champions
+        champion.debuff_targets = [champion]
+    demon_lord_entity.friendly_entities = [demon_lord_entity]
+    demon_lord_entity.enemy_entities = champions
+    demon_lord_entity.buff_targets = [demon_lord_entity]
+    demon_lord_entity.debuff_targets = champions
+
+    return champions + [demon_lord_entity]
+
+
+def _copy_entities(entities: List[CharacterState]) -> List[CharacterState]:
+    """Snapshot a fight: independent copies of every entity, linked to each other like the originals."""
+    copies = []
+    for entity in entities:
+        # Slot by slot rather than through __slots__ and setattr(): this runs once per boss of every team in
+        # simulate_bosses()
+        entity_copy = object.__new__(CharacterState)
+        entity_copy.character_config = entity.character_config
+        entity_copy.id = entity.id
+        entity_copy.is_demon_lord = entity.is_demon_lord
+        entity_copy.is_donnie = entity.is_donnie
+        entity_copy.fixed_point = entity.fixed_point
+        entity_copy.turn_meter_unit = entity.turn_meter_unit
+        entity_copy.speed_units = entity.speed_units
+        entity_copy.ability_cooldowns = entity.ability_cooldowns[:]
+        entity_copy.ability_delays = entity.ability_delays[:]
+        turn_meter = entity.turn_meter
+        entity_copy.turn_meter = turn_meter.copy() if isinstance(turn_meter, np.ndarray) else turn_meter
+        entity_copy.buff_durations = entity.buff_durations[:]
+        entity_copy.debuff_durations = entity.debuff_durations[:]
+        entity_copy.donnies_passive_cooldown = entity.donnies_passive_cooldown
+        copies.append(entity_copy)
+
+    for entity, entity_copy in zip(entities, copies):
+        entity_copy.friendly_entities = [copies[e.id] for e in entity.friendly_entities]
+        entity_copy.enemy_entities = [copies[e.id] for e in entity.enemy_entities]
+        entity_copy.buff_targets = [copies[e.id] for e in entity.buff_targets]
+        entity_copy.debuff_targets = [copies[e.id] for e in entity.debuff_targets]
+    return copies
+
+
+def _increase_buff_duration(entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        buff_durations = friendly_entity.buff_durations
+        for i in range(len(buff_durations)):
+            if buff_durations[i] > 0:
+                buff_durations[i] += 1
+    return False
+
+
+def _decrease_debuff_duration(entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        debuff_durations = friendly_entity.debuff_durations
+        for i in range(len(debuff_durations)):
+            if debuff_durations[i] > 0:
+                debuff_durations[i] -= 1
+    return False
+
+
+def _remove_1_debuff(entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        if sum(d > 0 for d in friendly_entity.debuff_durations) > 1:
+            raise ValueError("Friendly entity had more than one debuff")
+        friendly_entity.debuff_durations = [0] * len(DEBUFF_INDICES)
+    return False
+
+
+def _remove_all_debuffs(entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        friendly_entity.debuff_durations = [0] * len(DEBUFF_INDICES)
+    return False
+
+
+def _boost_own_turn_meter(amount: int, entity: CharacterState) -> bool:
+    entity.turn_meter += amount * entity.turn_meter_unit
+    return False
+
+
+def _boost_friendly_turn_meter(amount: int, entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        friendly_entity.turn_meter += amount * friendly_entity.turn_meter_unit
+    return False
+
+
+def _extra_turn(entity: CharacterState) -> bool:
+    entity.turn_meter = 1_000_000 * entity.turn_meter_unit
+    return True
+
+
+def _reduce_friendly_cooldowns(turns: int, entity: CharacterState) -> bool:
+    for friendly_entity in entity.friendly_entities:
+        if entity is not friendly_entity:
+            for i in range(len(friendly_entity.ability_cooldowns)):
+                friendly_entity.ability_cooldowns[i] = max(0, friendly_entity.ability_cooldowns[i] - turns)
+    return False
+
+
+# What each effect does to the fight, given the entity using it. Returns whether that entity gets an extra turn.
+EFFECT_HANDLERS = {
+    Effect.INCREASE_BUFF_DURATION: _increase_buff_duration,
+    Effect.DECREASE_DEBUFF_DURATION: _decrease_debuff_duration,
+    Effect.REMOVE_1_DEBUFF: _remove_1_debuff,
+    Effect.REMOVE_ALL_DEBUFFS: _remove_all_debuffs,
+    Effect.TURN_METER_BOOST_5_SELF: partial(_boost_own_turn_meter, 5),
+    Effect.TURN_METER_BOOST_10_SELF: partial(_boost_own_turn_meter, 10),
+    Effect.TURN_METER_BOOST_15: partial(_boost_friendly_turn_meter, 15),
+    Effect.TURN_METER_BOOST_20: partial(_boost_friendly_turn_meter, 20),
+    Effect.TURN_METER_BOOST_30: partial(_boost_friendly_turn_meter, 30),
+    Effect.EXTRA_TURN_SELF: _extra_turn,
+    Effect.REDUCE_COOLDOWN_2_TURNS: partial(_reduce_friendly_cooldowns, 2),
+}
+
+
+@dataclass(frozen=True)
+class CompiledAbility:
+    """An ability's effects as handlers, and its buffs/debuffs as (type index, duration) pairs."""
+
+    effects: Tuple[Callable[[CharacterState], bool], ...]
+    # (buff index, duration, whether the buff only targets the champion using it)
+    buffs: Tuple[Tuple[int, int, bool], ...]
+    debuffs: Tuple[Tuple[int, int], ...]
+
+
+# id(ability) -> (ability, compiled ability); the ability is kept so its id can't be reused
+_compiled_abilities: Dict[int, Tuple[Ability, CompiledAbility]] = {}
+
+
+def _compile_ability(ability: Ability) -> CompiledAbility:
+    """Compile an ability the first time it is used, and return the cached result after that."""
+    cached = _compiled_abilities.get(id(ability))
+    if cached is not None:
+        return cached[1]
+
+    effects = []
+    for effect in ability.effects:
+        if effect not in EFFECT_HANDLERS:
+            raise TypeError(f"Unknown effect {effect}")
+        effects.append(EFFECT_HANDLERS[effect])
+
+    buffs = []
+    for buff in ability.buffs:
+        if buff.target not in (BuffTarget.ALL, BuffTarget.SELF):
+            raise ValueError
+        buffs.append((BUFF_INDICES[buff.buff_type], buff.duration, buff.target == BuffTarget.SELF))
+
+    debuffs = [(DEBUFF_INDICES[debuff.debuff_type], debuff.duration) for debuff in ability.debuffs]
+
+    compiled = CompiledAbility(effects=tuple(effects), buffs=tuple(buffs), debuffs=tuple(debuffs))
+    _compiled_abilities[id(ability)] = (ability, compiled)
+    return compiled
+
+
+def _select_entity_to_move(entities) -> Optional[CharacterState]:
+    entity_max_turn_meter = 0
+    entity_to_move = None
+    for entity in entities:
+        if entity.turn_meter >= 100 * entity.turn_meter_unit and entity.turn_meter > entity_max_turn_meter:
+            # Only replace entity if it has more turn meter than the previous; this
+            # ensures that in cases of speed ties:
+            # - Between 2 champions: the champion higher in the team order gets chosen
+            # - Between champion and demon lord: champion gets chosen
+            entity_max_turn_meter = entity.turn_meter
+            entity_to_move = entity
+    return entity_to_move
+
+
+def _run_tie(entities, entity_to_move: CharacterState, tie_runs):
+    """
+    Whether another character of the mover's run in `tie_runs` ((start, end) team positions) has exactly as much
+    turn meter and a different config, so the mover only goes first for its place in the team. Works on the turn
+    meters and speeds with one value per lane of simulate_variants() as well, giving one result per lane.
+    """
+    for start, end in tie_runs:
+        if start <= entity_to_move.id < end:
+            config = entity_to_move.character_config
+            tied = False
+            for entity in entities[start:end]:
+                if entity is entity_to_move:
+                    continue
+                equal = entity.turn_meter == entity_to_move.turn_meter
+                # Plain floats compare to a bool, which keeps the common case cheap; lanes compare to an array
+                if equal is False or (equal is not True and not equal.any()):
+                    continue
+                other = entity.character_config
+                tied = tied | (equal & ((other.speed != config.speed) | (other.abilities != config.abilities)))
+            return tied
+    return False
+
+
+def _take_turn(entity_to_move: CharacterState):
+    """
+    Let `entity_to_move` take its turn: pick an ability, apply its effects and hand out buffs/debuffs.
+
+    Returns:
+        tuple[AbilityConfig, bool]: The ability used and whether the entity earned an extra turn.
+    """
+    extra_turn = False
+
+    # Reset turn meter
+    entity_to_move.turn_meter = 0
+
+    # Decrease cooldowns
+    for i in range(len(entity_to_move.ability_cooldowns)):
+        entity_to_move.ability_cooldowns[i] = max(0, entity_to_move.ability_cooldowns[i] - 1)
+    entity_to_move.donnies_passive_cooldown = max(0, entity_to_move.donnies_passive_cooldown - 1)
+
+    # Choose ability
+    chosen_ability_config = None
+    chosen_ability_priority = 0
+    chosen_ability_index = -1
+    for i, ability in enumerate(entity_to_move.character_config.abilities):
+        if (
+            entity_to_move.ability_cooldowns[i] == 0
+            and entity_to_move.ability_delays[i] == 0
+            and ability.priority > chosen_ability_priority
+        ):
+            chosen_ability_config = ability
+            chosen_ability_priority = ability.priority
+            chosen_ability_index = i
+
+    # Reset cooldown
+    entity_to_move.ability_cooldowns[chosen_ability_index] = entity_to_move.character_config.abilities[
+        chosen_ability_index
+    ].ability.cooldown
+
+    # Decrease delays
+    for i in range(len(entity_to_move.ability_delays)):
+        entity_to_move.ability_delays[i] = max(0, entity_to_move.ability_delays[i] - 1)
+
+    compiled_ability = _compile_ability(chosen_ability_config.ability)
+
+    # Use ability: instant effects
+    for handler in compiled_ability.effects:
+        if handler(entity_to_move):
+            extra_turn = True
+
+    # Decrease buff duration
+    buff_durations = entity_to_move.buff_durations
+    for i in range(len(buff_durations)):
+        if buff_durations[i] > 0:
+            buff_durations[i] -= 1
+
+    # Decrease debuff duration
+    debuff_durations = entity_to_move.debuff_durations
+    for i in range(len(debuff_durations)):
+        if debuff_durations[i] > 0:
+            debuff_durations[i] -= 1
+
+    # Use ability: distribute buffs
+    for buff_index, duration, self_only in compiled_ability.buffs:
+        if self_only and not entity_to_move.is_demon_lord:
+            raise NotImplementedError
+        for target_entity in entity_to_move.buff_targets:
+            target_entity.buff_durations[buff_index] = max(duration, target_entity.buff_durations[buff_index])
+
+    # Use ability: distribute debuffs
+    for debuff_index, duration in compiled_ability.debuffs:
+        for target_entity in entity_to_move.debuff_targets:
+            target_entity.debuff_durations[debuff_index] = max(duration, target_entity.debuff_durations[debuff_index])
+
+    return chosen_ability_config, extra_turn
 
 
-def simulate(characters: List[CharacterConfig], demon_lord: CharacterConfig, debug: bool = False):
-    entities = {}
-    for character in characters:
-        entity = CharacterState(character)
-        entities[entity.uid] = entity
+def _has_block_damage(entity: CharacterState) -> bool:
+    return entity.buff_durations[BLOCK_DAMAGE_INDEX] > 0
 
-    demon_lord_entity = CharacterState(demon_lord)
-    entities[demon_lord_entity.uid] = demon_lord_entity
+
+def _demon_lord_turn_failed(entities, chosen_ability_config: AbilityConfig) -> bool:
+    """Check whether the team survives the demon lord turn that was just taken."""
+    everyone_has_block_damage = True
+    for character in entities:
+        if not character.is_demon_lord and not _has_block_damage(character):
+            everyone_has_block_damage = False
+            break
+
+    if everyone_has_block_damage:
+        return False
+
+    if chosen_ability_config.ability.name == DEMON_LORD_A1.name:
+        donnie = None
+        for character in entities:
+            if character.is_donnie:
+                donnie = character
+
+        if donnie is not None and donnie.donnies_passive_cooldown == 0:
+            donnie.donnies_passive_cooldown = 4
+            return False
+
+    return True
+
+
+def _fight_state(entities) -> tuple:
+    """Everything that decides how the rest of the fight plays out, as a hashable fingerprint."""
+    return tuple(
+        (
+            entity.turn_meter.tobytes() if isinstance(entity.turn_meter, np.ndarray) else entity.turn_meter,
+            tuple(entity.ability_cooldowns),
+            tuple(entity.ability_delays),
+            tuple(entity.buff_durations),
+            tuple(entity.debuff_durations),
+            entity.donnies_passive_cooldown,
+        )
+        for entity in entities
+    )
+
+
+def _current_speed(entity: CharacterState) -> float:
+    current_speed = entity.character_config.speed
+    # Not in place: speed may be an array shared with the character config (see simulate_variants())
+    if entity.buff_durations[INCREASE_SPEED_30_INDEX] > 0:
+        current_speed = current_speed * 1.3
+    if entity.debuff_durations[DECREASE_SPEED_15_INDEX] > 0:
+        current_speed = current_speed * 0.85
+    return current_speed
+
+
+def _turn_meter_gain(entity: CharacterState) -> float:
+    """Turn meter an entity gains per tick, in its turn meter units."""
+    if not entity.fixed_point:
+        return _current_speed(entity) * TURN_METER_TICK_MULTIPLIER
+
+    # speed * 0.07, scaled from speed units to turn meter units
+    gain = entity.speed_units * 7 * FIXED_POINT_TURN_METER_SCALE
+    divisor = 100 * FIXED_POINT_SPEED_SCALE
+    if entity.buff_durations[INCREASE_SPEED_30_INDEX] > 0:
+        gain *= 13
+        divisor *= 10
+    if entity.debuff_durations[DECREASE_SPEED_15_INDEX] > 0:
+        gain *= 17
+        divisor *= 20
+    return gain // divisor
+
+
+def _ticks_until_next_turn(entities, turn_meter_gains: List[float]) -> int:
+    """
+    Number of ticks that can be applied at once without anyone skipping past their turn.
+
+    Mirrors the tick engine, which always ticks once after a regular turn and then keeps ticking until
+    some entity reaches 100 turn meter. The estimate is made with a small tolerance so it never overshoots
+    the tick on which repeated addition would cross 100; if it falls just short, the next iteration simply
+    finds nobody ready and ticks again. Fixed-point turn meters need no tolerance.
+    """
+    ticks = math.inf
+    for entity, gain in zip(entities, turn_meter_gains):
+        missing = 100 * entity.turn_meter_unit - entity.turn_meter
+        if not entity.fixed_point:
+            missing -= TURN_METER_TOLERANCE
+        if missing <= gain:
+            return 1
+        if gain > 0:
+            entity_ticks = -(-missing // gain) if entity.fixed_point else math.ceil(missing / gain)
+            if entity_ticks < ticks:
+                ticks = entity_ticks
+
+    if ticks == math.inf:
+        raise ValueError("No entity will ever reach 100 turn meter")
+    return ticks
+
+
+def _advance_turn_meters(entities, event_driven: bool) -> int:
+    """Advance every entity's turn meter by one tick, or up to the next turn when event-driven. Returns the ticks applied."""
+    if not event_driven:
+        for entity in entities:
+            entity.turn_meter += _turn_meter_gain(entity)
+        return 1
+
+    # Most turns are followed by another one on the very next tick, so take that tick first and only estimate a
+    # jump when nobody is ready after it
+    turn_meter_gains = []
+    ready = False
+    for entity in entities:
+        gain = _turn_meter_gain(entity)
+        entity.turn_meter += gain
+        turn_meter_gains.append(gain)
+        if entity.turn_meter >= 100 * entity.turn_meter_unit:
+            ready = True
+    if ready:
+        return 1
+
+    ticks = _ticks_until_next_turn(entities, turn_meter_gains)
+    for entity, gain in zip(entities, turn_meter_gains):
+        if entity.fixed_point:
+            entity.turn_meter += gain * ticks
+            continue
+        # One tick at a time so turn meters stay bit-for-bit identical to the tick engine
+        for _ in range(ticks):
+            entity.turn_meter += gain
+    return 1 + ticks
+
+
+def simulate(
+    characters: List[CharacterConfig],
+    demon_lord: Union[CharacterConfig, List[CharacterConfig]],
+    debug: bool = False,
+    event_driven: bool = False,
+    detect_cycles: bool = False,
+    turn_limit: Optional[float] = None,
+    fixed_point: bool = False,
+    specialized: bool = False,
+    trace=None,
+    stats=None,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+):
+    """
+    Simulate a clan boss fight and return the demon lord turn the team failed on.
+
+    Args:
+        characters (list[CharacterConfig]): The team, in team order.
+        demon_lord (CharacterConfig | list[CharacterConfig]): Boss configuration, or several to fight the team
+            against (e.g. [DEMON_LORD_NM, DEMON_LORD_UNM]), sharing the fight up to the first boss turn (see
+            simulate_bosses()) unless debug, fixed_point, specialized, trace, stats or a turn_limit are given.
+        debug (bool): Print every turn and tick.
+        event_driven (bool): Jump straight to the next tick on which someone can move instead of
+            advancing turn meters one tick at a time. Turn order and tie-breaks are the same as the
+            tick-by-tick engine.
+        detect_cycles (bool): Fingerprint the fight after every demon lord turn and stop as soon as a
+            fingerprint repeats. The fight is deterministic, so it would loop through the same turns
+            forever without failing, and it counts as survived.
+        turn_limit (float | None): Demon lord turn the fight is won on, DEMON_LORD_TURN_LIMIT if None.
+            May be math.inf together with detect_cycles.
+        fixed_point (bool): Keep speeds and turn meters in integers (see FIXED_POINT_TURN_METER_SCALE).
+            Only the speeds are rounded, so the result can differ from the float engine when a turn
+            meter lands within float error of 100 or of another entity's.
+        specialized (bool): Run the fight function generated for the team's roster shape (see
+            specialized_fight()) instead of the generic engine. Always event-driven; not available with debug
+            or fixed_point.
+        trace (TraceRecorder | list[TraceRecorder] | None): Record every turn into this recorder (see traces.py),
+            to pretty-print or diff afterwards; one per boss if `demon_lord` is a list. Costs nothing when None.
+        stats (SimulationStats | list[SimulationStats] | None): Add what the fight did (ticks, turns, effects, the
+            turn it failed on) to these counters (see instrumentation.py); one per boss if `demon_lord` is a list.
+            Costs nothing when None.
+        tie_runs (list[tuple[int, int]] | None): (start, end) team positions of runs of characters with the same
+            abilities. If given, also return whether one of a run was picked to move on an exact turn meter tie
+            with another of a different config (see _run_tie()): only then can reordering the run change the fight.
+
+    Returns:
+        int | list[int]: The demon lord turn the team failed on, or `turn_limit` if it survived; one per boss if
+            `demon_lord` is a list. With `tie_runs`, (that, whether there was a tie against any boss).
+    """
+    if isinstance(demon_lord, list):
+        for name, per_boss in (("trace", trace), ("stats", stats)):
+            if per_boss is not None and not (isinstance(per_boss, list) and len(per_boss) == len(demon_lord)):
+                raise ValueError(f"Against several bosses, {name} must be a list with one per boss")
+        per_boss_options = debug or fixed_point or specialized or trace is not None or stats is not None
+        if not per_boss_options and turn_limit in (None, DEMON_LORD_TURN_LIMIT):
+            return simulate_bosses(characters, demon_lord, detect_cycles, event_driven, tie_runs)
+        results = [
+            simulate(
+                characters,
+                boss,
+                debug,
+                event_driven,
+                detect_cycles,
+                turn_limit,
+                fixed_point,
+                specialized,
+                None if trace is None else trace[i],
+                None if stats is None else stats[i],
+                tie_runs,
+            )
+            for i, boss in enumerate(demon_lord)
+        ]
+        if tie_runs is None:
+            return results
+        return [turns for turns, _ in results], any(tied for _, tied in results)
+    if turn_limit is None:
+        turn_limit = DEMON_LORD_TURN_LIMIT
+    if turn_limit == math.inf and not detect_cycles:
+        raise ValueError("An unlimited fight needs detect_cycles to ever end")
+    if specialized:
+        if debug or fixed_point or trace is not None or stats is not None:
+            raise ValueError("Specialized fights support neither debug, fixed_point, trace nor stats")
+        return specialized_fight(characters, demon_lord, tie_runs=tie_runs)(
+            characters, demon_lord, turn_limit, detect_cycles
+        )
+
+    entities = _create_entities(characters, demon_lord, fixed_point)
+    if trace is not None:
+        trace.start(entities)
+    if stats is not None:
+        stats.simulations += 1
 
     demon_lord_turns = 0
-    while demon_lord_turns < DEMON_LORD_TURN_LIMIT - 1:
-        entity_max_turn_meter = 0
-        entity_to_move = None
-        for entity_name, entity in entities.items():
-            if entity.turn_meter >= 100 and entity.turn_meter > entity_max_turn_meter:
-                # Only replace entity if it has more turn meter than the previous; this
-                # ensures that in cases of speed ties:
-                # - Between 2 champions: the champion higher in the team order gets chosen
-                # - Between champion and demon lord: champion gets chosen
-                entity_max_turn_meter = entity.turn_meter
-                entity_to_move = entity
+    elapsed_ticks = 0
+    fight_states = set()
+    tied = False
+    while demon_lord_turns < turn_limit - 1:
+        entity_to_move = _select_entity_to_move(entities)
+        if tie_runs is not None and entity_to_move is not None and not tied:
+            tied = _run_tie(entities, entity_to_move, tie_runs)
 
         extra_turn = False
 
         if entity_to_move is not None:
-            # Reset turn meter
-            entity_to_move.turn_meter = 0
-
-            # Decrease cooldowns
-            for i in range(len(entity_to_move.ability_cooldowns)):
-                entity_to_move.ability_cooldowns[i] = max(0, entity_to_move.ability_cooldowns[i] - 1)
-            entity_to_move.donnies_passive_cooldown = max(0, entity_to_move.donnies_passive_cooldown - 1)
-
-            # Choose ability
-            chosen_ability_config = None
-            chosen_ability_priority = 0
-            chosen_ability_index = -1
-            for i, ability in enumerate(entity_to_move.character_config.abilities):
-                if (
-                    entity_to_move.ability_cooldowns[i] == 0
-                    and entity_to_move.ability_delays[i] == 0
-                    and ability.priority > chosen_ability_priority
-                ):
-                    chosen_ability_config = ability
-                    chosen_ability_priority = ability.priority
-                    chosen_ability_index = i
+            if trace is not None:
+                turn_meters = [e.turn_meter for e in entities]
+            chosen_ability_config, extra_turn = _take_turn(entity_to_move)
+
+            if entity_to_move.is_demon_lord:
+                demon_lord_turns += 1
+
+            if debug:
+                event_name = "[CB turn]" if entity_to_move.is_demon_lord else "[champ turn]"
+                print(
+                    f"{event_name} character: {entity_to_move.uid}, ability: {chosen_ability_config.ability.name}, active buffs: {entity_to_move.buffs}, active debuffs: {entity_to_move.debuffs}"
+                )
 
-            # Reset cooldown
-            entity_to_move.ability_cooldowns[chosen_ability_index] = entity_to_move.character_config.abilities[
-                chosen_ability_index
-            ].ability.cooldown
+            # Check if failed
+            failed = entity_to_move.is_demon_lord and _demon_lord_turn_failed(entities, chosen_ability_config)
+            if trace is not None:
+                trace.record(
+                    elapsed_ticks,
+                    entities,
+                    entity_to_move,
+                    entity_to_move.character_config.abilities.index(chosen_ability_config),
+                    (EXTRA_TURN if extra_turn else 0) | (FAILED if failed else 0),
+                    turn_meters,
+                )
+            if stats is not None:
+                _count_turn(stats, entity_to_move, chosen_ability_config, extra_turn)
+            if failed:
+                if stats is not None:
+                    stats.ticks += elapsed_ticks
+                    stats.failures[demon_lord_turns + 1] += 1
+                return demon_lord_turns + 1 if tie_runs is None else (demon_lord_turns + 1, tied)
 
-            # Decrease delays
-            for i in range(len(entity_to_move.ability_delays)):
-                entity_to_move.ability_delays[i] = max(0, entity_to_move.ability_delays[i] - 1)
+            # Check if the fight has started repeating itself
+            if detect_cycles and entity_to_move.is_demon_lord:
+                fight_state = _fight_state(entities)
+                if fight_state in fight_states:
+                    if stats is not None:
+                        stats.ticks += elapsed_ticks
+                        stats.survived += 1
+                    return turn_limit if tie_runs is None else (turn_limit, tied)
+                fight_states.add(fight_state)
+        elif stats is not None:
+            stats.empty_ticks += 1
 
-            # Use ability: instant effects
-            for effect in chosen_ability_config.ability.effects:
-                character_entities = [e for e in entities.values() if not e.is_demon_lord]
-                demon_lord_entities = [demon_lord_entity]
-                if entity_to_move.is_demon_lord:
-                    friendly_entities = demon_lord_entities
-                    enemy_entities = character_entities
-                else:
-                    friendly_entities = character_entities
-                    enemy_entities = demon_lord_entities
-
-                if effect == Effect.INCREASE_BUFF_DURATION:
-                    for friendly_entity in friendly_entities:
-                        for friendly_entity_buff in friendly_entity.buffs:
-                            friendly_entity_buff.duration += 1
-                        friendly_entity.remove_expired_buffs_and_debuffs()
-                elif effect == Effect.DECREASE_DEBUFF_DURATION:
-                    for friendly_entity in friendly_entities:
-                        for friendly_entity_debuff in friendly_entity.debuffs:
-                            friendly_entity_debuff.duration -= 1
-                        friendly_entity.remove_expired_buffs_and_debuffs()
-                elif effect == Effect.REMOVE_1_DEBUFF:
-                    for friendly_entity in friendly_entities:
-                        if len(friendly_entity.debuffs) > 1:
-                            raise ValueError("Friendly entity had more than one debuff")
-                        friendly_entity.debuffs = []
-                elif effect == Effect.REMOVE_ALL_DEBUFFS:
-                    for friendly_entity in friendly_entities:
-                        friendly_entity.debuffs = []
-                elif effect == Effect.TURN_METER_BOOST_5_SELF:
-                    entity_to_move.turn_meter += 5
-                elif effect == Effect.TURN_METER_BOOST_10_SELF:
-                    entity_to_move.turn_meter += 10
-                elif effect == Effect.TURN_METER_BOOST_15:
-                    for friendly_entity in friendly_entities:
-                        friendly_entity.turn_meter += 15
-                elif effect == Effect.TURN_METER_BOOST_20:
-                    for friendly_entity in friendly_entities:
-                        friendly_entity.turn_meter += 20
-                elif effect == Effect.TURN_METER_BOOST_30:
-                    for friendly_entity in friendly_entities:
-                        friendly_entity.turn_meter += 30
-                elif effect == Effect.EXTRA_TURN_SELF:
-                    entity_to_move.turn_meter = 1e6
-                    extra_turn = True
-                elif effect == Effect.REDUCE_COOLDOWN_2_TURNS:
-                    for friendly_entity in friendly_entities:
-                        if entity_to_move != friendly_entity:
-                            for i in range(len(friendly_entity.ability_cooldowns)):
-                                friendly_entity.ability_cooldowns[i] = max(0, friendly_entity.ability_cooldowns[i] - 2)
+        ticks = 0 if extra_turn else _advance_turn_meters(entities, event_driven)
+        elapsed_ticks += ticks
+
+        if debug:
+            print(f"\n[tick x{ticks}]" if ticks > 1 else "\n[tick]")
+            for e in entities:
+                print(f"\tcharacter: {e.uid}, turn meter: {e.turn_meter}, ability cooldowns: {e.ability_cooldowns}")
+
+    if stats is not None:
+        stats.ticks += elapsed_ticks
+        stats.survived += 1
+    return demon_lord_turns + 1 if tie_runs is None else (demon_lord_turns + 1, tied)
+
+
+def _count_turn(stats, entity: CharacterState, chosen_ability_config: AbilityConfig, extra_turn: bool):
+    """Add a turn of `entity` to SimulationStats."""
+    compiled_ability = _compile_ability(chosen_ability_config.ability)
+    stats.turns += 1
+    stats.extra_turns += extra_turn
+    stats.effects += (
+        len(compiled_ability.effects)
+        + len(compiled_ability.buffs) * len(entity.buff_targets)
+        + len(compiled_ability.debuffs) * len(entity.debuff_targets)
+    )
+
+
+# id(ability) -> (ability, what specialized code generation needs to know about it)
+_ability_shapes: Dict[int, tuple] = {}
+
+# (roster shape, whether turns are recorded) -> generated fight function; filled in by each process on first use
+_specialized_fights: Dict[tuple, Callable] = {}
+
+
+def _ability_shape(ability: Ability) -> tuple:
+    cached = _ability_shapes.get(id(ability))
+    if cached is not None:
+        return cached[1]
+
+    compiled = _compile_ability(ability)
+    shape = (ability.name, ability.cooldown, tuple(effect.name for effect in ability.effects), compiled.buffs, compiled.debuffs)
+    _ability_shapes[id(ability)] = (ability, shape)
+    return shape
+
+
+def roster_shape(characters: List[CharacterConfig], demon_lord: CharacterConfig) -> tuple:
+    """
+    Everything about a team that specialized_fight() generates code for: who is Donnie and what every ability
+    does. Speeds, priorities and delays are left out, so every team of a sweep has the same shape.
+    """
+    return tuple(
+        (character.name == DONNIE.name, tuple(_ability_shape(a.ability) for a in character.abilities))
+        for character in characters
+    ) + ((False, tuple(_ability_shape(a.ability) for a in demon_lord.abilities)),)
+
+
+def _generate_fight_source(shape: tuple, record_turns: bool = False, tie_runs: Optional[tuple] = None) -> str:
+    """
+    Source of a fight function for one roster_shape(), equivalent to the event-driven simulate(), or to
+    fight_until_failure() if `record_turns`, with their `tie_runs` if given.
+
+    Every entity's state lives in local variables (turn meter t<entity>, cooldowns c<entity>_<ability>, delays
+    d<entity>_<ability>, buffs b<entity>_<type>, debuffs u<entity>_<type>), and every loop over entities,
+    abilities and effects is unrolled. Cooldowns of abilities without one, buffs and debuffs nobody hands out,
+    BLOCK_DAMAGE on the demon lord and Donnie's passive on teams without him are left out altogether. Buffs other
+    than INCREASE_SPEED_30 and BLOCK_DAMAGE aren't modeled and raise NotImplementedError.
+    """
+    demon_lord = len(shape) - 1
+    champions = list(range(demon_lord))
+    entities = champions + [demon_lord]
+    donnie = max((i for i in champions if shape[i][0]), default=None)
+
+    def friendly(e):
+        return champions if e != demon_lord else [demon_lord]
+
+    def debuff_targets(e):
+        return [e] if e != demon_lord else champions
+
+    buffs = {e: set() for e in entities}
+    debuffs = {e: set() for e in entities}
+    for e in entities:
+        for _, _, _, ability_buffs, ability_debuffs in shape[e][1]:
+            for index, _, _ in ability_buffs:
+                if index not in (INCREASE_SPEED_30_INDEX, BLOCK_DAMAGE_INDEX):
+                    raise NotImplementedError(f"Specialized fights don't model {list(BUFF_INDICES)[index].name}")
+                for target in friendly(e):
+                    if index == INCREASE_SPEED_30_INDEX or (index == BLOCK_DAMAGE_INDEX and target != demon_lord):
+                        buffs[target].add(index)
+            for index, _ in ability_debuffs:
+                for target in debuff_targets(e):
+                    debuffs[target].add(index)
+    buffs = {e: sorted(indices) for e, indices in buffs.items()}
+    debuffs = {e: sorted(indices) for e, indices in debuffs.items()}
+
+    def cooldowns(e):
+        return [f"c{e}_{a}" for a, ability in enumerate(shape[e][1]) if ability[1] > 0]
+
+    def delays(e):
+        return [f"d{e}_{a}" for a in range(len(shape[e][1]))]
+
+    state = [f"t{e}" for e in entities]
+    for e in entities:
+        state += cooldowns(e) + delays(e) + [f"b{e}_{k}" for k in buffs[e]] + [f"u{e}_{k}" for k in debuffs[e]]
+    if donnie is not None:
+        state.append("dp")
+
+    lines = []
+
+    def emit(level, line):
+        lines.append("    " * level + line)
+
+    def result(turns):
+        return ", ".join((["turns"] if record_turns else []) + [turns] + (["tied"] if tie_runs is not None else []))
+
+    emit(0, "def fight(characters, demon_lord, turn_limit, detect_cycles):")
+    emit(1, "configs = list(characters) + [demon_lord]")
+    for e in entities:
+        emit(1, f"abilities = configs[{e}].abilities")
+        emit(1, f"s{e} = configs[{e}].speed")
+        for a in range(len(shape[e][1])):
+            emit(1, f"p{e}_{a} = abilities[{a}].priority")
+            emit(1, f"d{e}_{a} = abilities[{a}].delay")
+    for variable in state:
+        if not variable.startswith("d") or variable == "dp":
+            emit(1, f"{variable} = 0")
+    if tie_runs is not None:
+        # Whether two of a run have different configs, which is all a tie between them matters for
+        emit(1, "tied = False")
+        for start, end in tie_runs:
+            for i, j in itertools.combinations(range(start, end), 2):
+                emit(1, f"q{i}_{j} = s{i} != s{j} or configs[{i}].abilities != configs[{j}].abilities")
+
+    # Turn meter gained per tick, for every combination of speed buff and debuff the entity can have
+    gains = {}
+    for e in entities:
+        fast = f"b{e}_{INCREASE_SPEED_30_INDEX}" if INCREASE_SPEED_30_INDEX in buffs[e] else None
+        slow = f"u{e}_{DECREASE_SPEED_15_INDEX}" if DECREASE_SPEED_15_INDEX in debuffs[e] else None
+        emit(1, f"g{e} = s{e} * MULT")
+        if fast:
+            emit(1, f"gf{e} = s{e} * 1.3 * MULT")
+        if slow:
+            emit(1, f"gs{e} = s{e} * 0.85 * MULT")
+        if fast and slow:
+            emit(1, f"gfs{e} = s{e} * 1.3 * 0.85 * MULT")
+            gains[e] = f"(gfs{e} if {slow} else gf{e}) if {fast} else (gs{e} if {slow} else g{e})"
+        elif fast:
+            gains[e] = f"gf{e} if {fast} else g{e}"
+        elif slow:
+            gains[e] = f"gs{e} if {slow} else g{e}"
+
+    emit(1, "fight_states = set()")
+    if record_turns:
+        emit(1, "turns = []")
+        emit(1, "elapsed = 0")
+    emit(1, "demon_lord_turns = 0")
+    emit(1, "while demon_lord_turns < turn_limit - 1:")
+
+    # Select the entity to move
+    emit(2, "mover = -1")
+    emit(2, "most = 0")
+    for e in entities:
+        emit(2, f"if t{e} >= 100 and t{e} > most:")
+        emit(3, f"most = t{e}")
+        emit(3, f"mover = {e}")
+    for start, end in tie_runs or ():
+        emit(2, f"if not tied and {start} <= mover < {end}:")
+        for i in range(start, end):
+            others = [f"t{j} == most and q{min(i, j)}_{max(i, j)}" for j in range(start, end) if j != i]
+            emit(3, f"{'if' if i == start else 'elif'} mover == {i}:")
+            emit(4, f"tied = {' or '.join(others)}")
+    emit(2, "extra_turn = False")
+
+    for e in entities:
+        emit(2, f"{'if' if e == 0 else 'elif'} mover == {e}:")
+        if record_turns:
+            emit(3, f"turns.append((elapsed, {e}))")
+        emit(3, f"t{e} = 0")
+        for cooldown in cooldowns(e):
+            emit(3, f"if {cooldown}:")
+            emit(4, f"{cooldown} -= 1")
+        if e == donnie:
+            emit(3, "if dp:")
+            emit(4, "dp -= 1")
+
+        emit(3, "chosen = -1")
+        emit(3, "priority = 0")
+        for a, ability in enumerate(shape[e][1]):
+            conditions = ([f"c{e}_{a} == 0"] if ability[1] > 0 else []) + [f"d{e}_{a} == 0", f"p{e}_{a} > priority"]
+            emit(3, f"if {' and '.join(conditions)}:")
+            emit(4, f"chosen = {a}")
+            emit(4, f"priority = p{e}_{a}")
+        for delay in delays(e):
+            emit(3, f"if {delay}:")
+            emit(4, f"{delay} -= 1")
+
+        for a, (_, cooldown, effects, ability_buffs, ability_debuffs) in enumerate(shape[e][1]):
+            emit(3, f"{'if' if a == 0 else 'elif'} chosen == {a}:")
+            branch_start = len(lines)
+            if cooldown > 0:
+                emit(4, f"c{e}_{a} = {cooldown}")
+
+            for effect in effects:
+                if effect == Effect.INCREASE_BUFF_DURATION.name:
+                    for target in friendly(e):
+                        for k in buffs[target]:
+                            emit(4, f"if b{target}_{k}:")
+                            emit(5, f"b{target}_{k} += 1")
+                elif effect == Effect.DECREASE_DEBUFF_DURATION.name:
+                    for target in friendly(e):
+                        for k in debuffs[target]:
+                            emit(4, f"if u{target}_{k}:")
+                            emit(5, f"u{target}_{k} -= 1")
+                elif effect in (Effect.REMOVE_1_DEBUFF.name, Effect.REMOVE_ALL_DEBUFFS.name):
+                    for target in friendly(e):
+                        if effect == Effect.REMOVE_1_DEBUFF.name and len(debuffs[target]) > 1:
+                            emit(4, f"if {' + '.join(f'(u{target}_{k} > 0)' for k in debuffs[target])} > 1:")
+                            emit(5, 'raise ValueError("Friendly entity had more than one debuff")')
+                        for k in debuffs[target]:
+                            emit(4, f"u{target}_{k} = 0")
+                elif effect in (Effect.TURN_METER_BOOST_5_SELF.name, Effect.TURN_METER_BOOST_10_SELF.name):
+                    emit(4, f"t{e} += {5 if effect == Effect.TURN_METER_BOOST_5_SELF.name else 10}")
+                elif effect in (
+                    Effect.TURN_METER_BOOST_15.name,
+                    Effect.TURN_METER_BOOST_20.name,
+                    Effect.TURN_METER_BOOST_30.name,
+                ):
+                    for target in friendly(e):
+                        emit(4, f"t{target} += {effect.rsplit('_', 1)[1]}")
+                elif effect == Effect.EXTRA_TURN_SELF.name:
+                    emit(4, f"t{e} = 1000000")
+                    emit(4, "extra_turn = True")
+                elif effect == Effect.REDUCE_COOLDOWN_2_TURNS.name:
+                    for target in friendly(e):
+                        if target != e:
+                            for cooldown in cooldowns(target):
+                                emit(4, f"{cooldown} = {cooldown} - 2 if {cooldown} > 2 else 0")
                 else:
                     raise TypeError(f"Unknown effect {effect}")
 
-            # Decrease buff duration
-            for buff in entity_to_move.buffs:
-                buff.duration -= 1
+            for k in buffs[e]:
+                emit(4, f"if b{e}_{k}:")
+                emit(5, f"b{e}_{k} -= 1")
+            for k in debuffs[e]:
+                emit(4, f"if u{e}_{k}:")
+                emit(5, f"u{e}_{k} -= 1")
 
-            # Decrease debuff duration
-            for debuff in entity_to_move.debuffs:
-                debuff.duration -= 1
+            for index, duration, self_only in ability_buffs:
+                if self_only and e != demon_lord:
+                    emit(4, "raise NotImplementedError")
+                    break
+                for target in friendly(e):
+                    if index in buffs[target]:
+                        emit(4, f"if b{target}_{index} < {duration}:")
+                        emit(5, f"b{target}_{index} = {duration}")
+            for index, duration in ability_debuffs:
+                for target in debuff_targets(e):
+                    emit(4, f"if u{target}_{index} < {duration}:")
+                    emit(5, f"u{target}_{index} = {duration}")
+            if len(lines) == branch_start:
+                emit(4, "pass")
+        emit(3, "else:")
+        emit(4, f'raise ValueError("Entity {e} has no ability it can use")')
 
-            # Remove expired buffs and debuffs
-            entity_to_move.remove_expired_buffs_and_debuffs()
+        if e == demon_lord:
+            emit(3, "demon_lord_turns += 1")
+            # The team survives if every champion has BLOCK_DAMAGE, or on a stun Donnie's passive can block
+            protected = [f"b{c}_{BLOCK_DAMAGE_INDEX} > 0" for c in champions if BLOCK_DAMAGE_INDEX in buffs[c]]
+            level = 3
+            if champions and len(protected) == len(champions):
+                emit(3, f"if not ({' and '.join(protected)}):")
+                level = 4
+            stuns = [a for a, ability in enumerate(shape[e][1]) if ability[0] == DEMON_LORD_A1.name]
+            if donnie is not None and stuns:
+                emit(level, f"if chosen in {tuple(stuns)} and dp == 0:")
+                emit(level + 1, "dp = 4")
+                emit(level, "else:")
+                emit(level + 1, f"return {result('demon_lord_turns + 1')}")
+            else:
+                emit(level, f"return {result('demon_lord_turns + 1')}")
+            emit(3, "if detect_cycles:")
+            emit(4, f"fight_state = ({', '.join(state)},)")
+            emit(4, "if fight_state in fight_states:")
+            emit(5, f"return {result('turn_limit')}")
+            emit(4, "fight_states.add(fight_state)")
 
-            # Use ability: distribute buffs
-            for buff in chosen_ability_config.ability.buffs:
-                if entity_to_move.is_demon_lord:
-                    target_entities = [entity_to_move]
-                else:
-                    if buff.target == BuffTarget.ALL:
-                        target_entities = [e for e in entities.values() if not e.is_demon_lord]
+    # Advance turn meters up to the next tick on which someone can move, like _advance_turn_meters()
+    emit(2, "if not extra_turn:")
+    gain = {e: f"n{e}" if e in gains else f"g{e}" for e in entities}
+    for e in entities:
+        if e in gains:
+            emit(3, f"n{e} = {gains[e]}")
+        emit(3, f"m{e} = 100 - t{e} - TOLERANCE")
+    emit(3, f"if {' or '.join(f'm{e} <= {gain[e]}' for e in entities)}:")
+    emit(4, "ticks = 1")
+    emit(3, "else:")
+    emit(4, "ticks = inf")
+    for e in entities:
+        emit(4, f"if {gain[e]} > 0:")
+        emit(5, f"entity_ticks = ceil(m{e} / {gain[e]})")
+        emit(5, "if entity_ticks < ticks:")
+        emit(6, "ticks = entity_ticks")
+    emit(4, "if ticks == inf:")
+    emit(5, 'raise ValueError("No entity will ever reach 100 turn meter")')
+    # One tick at a time so turn meters stay bit-for-bit identical to the tick engine
+    emit(3, "for _ in range(ticks):")
+    for e in entities:
+        emit(4, f"t{e} += {gain[e]}")
+    if record_turns:
+        emit(3, "elapsed += ticks")
+
+    emit(1, f"return {result('demon_lord_turns + 1')}")
+    return "\n".join(lines) + "\n"
+
+
+def specialized_fight(
+    characters: List[CharacterConfig],
+    demon_lord: CharacterConfig,
+    record_turns: bool = False,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+) -> Callable:
+    """
+    The fight function generated for the roster_shape() of a team, generating and compiling it on first use.
+
+    The function is called as fight(characters, demon_lord, turn_limit, detect_cycles) with any team of that
+    shape, and returns what simulate() with event_driven=True would. With `record_turns`, it returns the turns
+    as well, like fight_until_failure(), and with `tie_runs` whether there was a tie, like simulate(). Each
+    process compiles every shape once, so a sweep, where every team has the same shape, pays for it once per
+    worker.
+    """
+    tie_runs = tuple(map(tuple, tie_runs)) if tie_runs is not None else None
+    shape = (roster_shape(characters, demon_lord), record_turns, tie_runs)
+    fight = _specialized_fights.get(shape)
+    if fight is None:
+        source = _generate_fight_source(*shape)
+        namespace = {
+            "ceil": math.ceil,
+            "inf": math.inf,
+            "MULT": TURN_METER_TICK_MULTIPLIER,
+            "TOLERANCE": TURN_METER_TOLERANCE,
+        }
+        exec(compile(source, f"<specialized fight {len(_specialized_fights)}>", "exec"), namespace)
+        fight = namespace["fight"]
+        fight.source = source
+        _specialized_fights[shape] = fight
+    return fight
+
+
+def fight_until_failure(
+    characters: List[CharacterConfig],
+    demon_lord: CharacterConfig,
+    specialized: bool = False,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+) -> tuple:
+    """
+    Simulate a fight like simulate(), recording who moved after how many ticks up to the failure.
+
+    Two fights that return the same turns have the same outcome, whatever would have happened after the failure.
+    With `specialized`, the fight function generated for the team's roster shape is run (see specialized_fight()).
+
+    Returns:
+        tuple[list[tuple[int, int]], int]: (ticks elapsed, entity index) for every turn up to the failure, and
+            the same value simulate() would return; with `tie_runs`, whether there was a tie as well (see
+            simulate()).
+    """
+    if specialized:
+        return specialized_fight(characters, demon_lord, record_turns=True, tie_runs=tie_runs)(
+            characters, demon_lord, DEMON_LORD_TURN_LIMIT, False
+        )
+
+    entities = _create_entities(characters, demon_lord)
+
+    turns = []
+    ticks = 0
+    demon_lord_turns = 0
+    tied = False
+    while demon_lord_turns < DEMON_LORD_TURN_LIMIT - 1:
+        entity_to_move = _select_entity_to_move(entities)
+        if tie_runs is not None and entity_to_move is not None and not tied:
+            tied = _run_tie(entities, entity_to_move, tie_runs)
+
+        extra_turn = False
+
+        if entity_to_move is not None:
+            chosen_ability_config, extra_turn = _take_turn(entity_to_move)
+            turns.append((ticks, entity_to_move.id))
+
+            if entity_to_move.is_demon_lord:
+                demon_lord_turns += 1
+                if _demon_lord_turn_failed(entities, chosen_ability_config):
+                    break
+
+        if not extra_turn:
+            ticks += _advance_turn_meters(entities, event_driven=True)
+
+    return (turns, demon_lord_turns + 1) if tie_runs is None else (turns, demon_lord_turns + 1, tied)
+
+
+def survival_intervals(
+    characters: List[CharacterConfig],
+    demon_lord: CharacterConfig,
+    character_index: int,
+    speed_range: Tuple[float, float],
+    tolerance: float = 1e-6,
+) -> List[Tuple[float, float]]:
+    """
+    Find the speeds of one character, fractional ones included, at which the team survives to the turn limit.
+
+    While a fight plays out turn for turn the same, every turn meter is a sum of terms that only grow with
+    the character's speed, so each turn landing on its tick (and in its place among the turns on that tick)
+    holds on one side of a boundary speed. The speeds giving one particular fight therefore form a single
+    interval: if the fight is the same at both ends of a range of speeds, it is the same everywhere in
+    between. The range is bisected until every part either plays out the same at both ends or is narrower
+    than `tolerance`, so boundaries are located to within `tolerance` and nothing narrower is missed.
+
+    Args:
+        characters (list[CharacterConfig]): The team, in team order.
+        demon_lord (CharacterConfig): Boss configuration.
+        character_index (int): Index in `characters` of the character whose speed is varied.
+        speed_range (tuple[float, float]): Lowest and highest speed to consider, both inclusive.
+        tolerance (float): Width below which a range of speeds isn't split any further.
+
+    Returns:
+        list[tuple[float, float]]: Disjoint (lowest, highest) speeds the team survives at, in increasing
+            order. Both ends were simulated; the boundary lies less than `tolerance` outside of them unless
+            they are the ends of `speed_range`.
+    """
+    base_character = characters[character_index]
+
+    def fight(speed):
+        team = list(characters)
+        team[character_index] = CharacterConfig(name=base_character.name, speed=speed, abilities=base_character.abilities)
+        turns, result = fight_until_failure(team, demon_lord)
+        return turns, result == DEMON_LORD_TURN_LIMIT
+
+    low, high = speed_range
+    low_fight = fight(low)
+    samples = [(low, low_fight[1])]
+    stack = [(low, low_fight, high, fight(high))] if high > low else []
+    while stack:
+        a, a_fight, b, b_fight = stack.pop()
+        if a_fight[0] == b_fight[0] or b - a <= tolerance:
+            samples.append((b, b_fight[1]))
+            continue
+        middle = (a + b) / 2
+        middle_fight = fight(middle)
+        # Left half last so it's split first and samples stay in increasing order
+        stack.append((middle, middle_fight, b, b_fight))
+        stack.append((a, a_fight, middle, middle_fight))
+
+    intervals = []
+    previous_survived = False
+    for speed, survived in samples:
+        if survived and previous_survived:
+            intervals[-1] = (intervals[-1][0], speed)
+        elif survived:
+            intervals.append((speed, speed))
+        previous_survived = survived
+    return intervals
+
+
+def simulate_batch(
+    teams: List[List[CharacterConfig]],
+    demon_lord: CharacterConfig,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+):
+    """
+    Simulate many teams in lockstep and return the demon lord turn each one failed on.
+
+    All teams must share a roster and ability layout (the same characters with the same abilities in the
+    same team positions) and may differ only in speeds, priorities and delays. Turn meters, cooldowns,
+    delays and buff/debuff durations are kept in (teams x entities) arrays so every tick and turn is
+    processed for the whole batch at once. Results are identical to calling simulate() on each team.
+
+    Args:
+        teams (list[list[CharacterConfig]]): Team configs, each in team order.
+        demon_lord (CharacterConfig): Boss configuration.
+        tie_runs (list[tuple[int, int]] | None): Runs of characters to watch for turn meter ties (see simulate()).
+
+    Returns:
+        np.ndarray: For every team, the demon lord turn it failed on, or DEMON_LORD_TURN_LIMIT if it survived;
+            with `tie_runs`, together with whether each team had a tie.
+    """
+    layout = teams[0]
+    for team in teams:
+        if len(team) != len(layout) or any(
+            character.name != reference.name
+            or [a.ability for a in character.abilities] != [a.ability for a in reference.abilities]
+            for character, reference in zip(team, layout)
+        ):
+            raise ValueError("All teams in a batch must share the same roster and ability layout")
+
+    num_lanes = len(teams)
+    entity_abilities = [[a.ability for a in c.abilities] for c in layout + [demon_lord]]
+    num_entities = len(entity_abilities)
+    max_abilities = max(len(abilities) for abilities in entity_abilities)
+    boss = num_entities - 1
+    champions = np.arange(boss)
+
+    base_cooldowns = np.zeros((num_entities, max_abilities), dtype=np.int64)
+    for e, abilities in enumerate(entity_abilities):
+        for a, ability in enumerate(abilities):
+            base_cooldowns[e, a] = ability.cooldown
+    boss_stun = np.zeros(max_abilities, dtype=bool)
+    for a, ability in enumerate(entity_abilities[boss]):
+        boss_stun[a] = ability.name == DEMON_LORD_A1.name
+    donnie_index = None
+    for e, character in enumerate(layout):
+        if character.name == DONNIE.name:
+            donnie_index = e
+
+    # Only abilities that do something beyond dealing damage need per-turn handling
+    active_abilities = [
+        (e, a, ability)
+        for e, abilities in enumerate(entity_abilities)
+        for a, ability in enumerate(abilities)
+        if ability.effects or ability.buffs or ability.debuffs
+    ]
+
+    speeds = np.array([[c.speed for c in team] + [demon_lord.speed] for team in teams], dtype=np.float64)
+    priorities = np.zeros((num_lanes, num_entities, max_abilities), dtype=np.int64)
+    delays = np.zeros((num_lanes, num_entities, max_abilities), dtype=np.int64)
+    for lane, team in enumerate(teams):
+        for e, character in enumerate(team + [demon_lord]):
+            for a, ability_config in enumerate(character.abilities):
+                priorities[lane, e, a] = ability_config.priority
+                delays[lane, e, a] = ability_config.delay
+
+    turn_meters = np.zeros((num_lanes, num_entities), dtype=np.float64)
+    cooldowns = np.zeros((num_lanes, num_entities, max_abilities), dtype=np.int64)
+    buffs = np.zeros((num_lanes, num_entities, len(BUFF_INDICES)), dtype=np.int64)
+    debuffs = np.zeros((num_lanes, num_entities, len(DEBUFF_INDICES)), dtype=np.int64)
+    passive_cooldowns = np.zeros((num_lanes, num_entities), dtype=np.int64)
+    demon_lord_turns = np.zeros(num_lanes, dtype=np.int64)
+
+    results = np.full(num_lanes, DEMON_LORD_TURN_LIMIT, dtype=np.int64)
+    lanes = np.arange(num_lanes)
+    tied = np.zeros(num_lanes, dtype=bool)
+    if tie_runs is not None:
+        # Every distinct config (speed, priorities and delays) gets a number, to tell members of a run apart
+        distinct_configs = {}
+        config_ids = np.array(
+            [
+                [
+                    distinct_configs.setdefault(
+                        (c.speed, tuple((a.priority, a.delay) for a in c.abilities)), len(distinct_configs)
+                    )
+                    for c in team + [demon_lord]
+                ]
+                for team in teams
+            ]
+        )
+
+    while len(lanes):
+        extra_turn = np.zeros(len(lanes), dtype=bool)
+        failed = np.zeros(len(lanes), dtype=bool)
+
+        # Pick who moves; argmax returns the first maximum, which gives the same tie-breaks as simulate()
+        ready = turn_meters >= 100
+        rows = np.flatnonzero(ready.any(axis=1))
+        movers = np.argmax(np.where(ready, turn_meters, -np.inf), axis=1)[rows]
+
+        for start, end in tie_runs or ():
+            mover_turn_meters = turn_meters[rows, movers]
+            mover_config_ids = config_ids[rows, movers]
+            others = (turn_meters[rows, start:end] == mover_turn_meters[:, None]) & (
+                config_ids[rows, start:end] != mover_config_ids[:, None]
+            )
+            tied[lanes[rows]] |= (movers >= start) & (movers < end) & others.any(axis=1)
+
+        if len(rows):
+            turn_meters[rows, movers] = 0
+            cooldowns[rows, movers] = np.maximum(0, cooldowns[rows, movers] - 1)
+            passive_cooldowns[rows, movers] = np.maximum(0, passive_cooldowns[rows, movers] - 1)
+
+            available = (cooldowns[rows, movers] == 0) & (delays[rows, movers] == 0)
+            chosen = np.argmax(np.where(available, priorities[rows, movers], 0), axis=1)
+            cooldowns[rows, movers, chosen] = base_cooldowns[movers, chosen]
+            delays[rows, movers] = np.maximum(0, delays[rows, movers] - 1)
+
+            groups = []
+            for e, a, ability in active_abilities:
+                group = rows[(movers == e) & (chosen == a)]
+                if len(group):
+                    groups.append((e, ability, group))
+
+            # Use ability: instant effects
+            for e, ability, group in groups:
+                friendly = np.array([boss]) if e == boss else champions
+                friendly_index = np.ix_(group, friendly)
+                for effect in ability.effects:
+                    if effect == Effect.INCREASE_BUFF_DURATION:
+                        buffs[friendly_index] += buffs[friendly_index] > 0
+                    elif effect == Effect.DECREASE_DEBUFF_DURATION:
+                        debuffs[friendly_index] = np.maximum(0, debuffs[friendly_index] - 1)
+                    elif effect == Effect.REMOVE_1_DEBUFF:
+                        if ((debuffs[friendly_index] > 0).sum(axis=2) > 1).any():
+                            raise ValueError("Friendly entity had more than one debuff")
+                        debuffs[friendly_index] = 0
+                    elif effect == Effect.REMOVE_ALL_DEBUFFS:
+                        debuffs[friendly_index] = 0
+                    elif effect == Effect.TURN_METER_BOOST_5_SELF:
+                        turn_meters[group, e] += 5
+                    elif effect == Effect.TURN_METER_BOOST_10_SELF:
+                        turn_meters[group, e] += 10
+                    elif effect == Effect.TURN_METER_BOOST_15:
+                        turn_meters[friendly_index] += 15
+                    elif effect == Effect.TURN_METER_BOOST_20:
+                        turn_meters[friendly_index] += 20
+                    elif effect == Effect.TURN_METER_BOOST_30:
+                        turn_meters[friendly_index] += 30
+                    elif effect == Effect.EXTRA_TURN_SELF:
+                        turn_meters[group, e] = 1e6
+                        extra_turn[group] = True
+                    elif effect == Effect.REDUCE_COOLDOWN_2_TURNS:
+                        others_index = np.ix_(group, friendly[friendly != e])
+                        cooldowns[others_index] = np.maximum(0, cooldowns[others_index] - 2)
+                    else:
+                        raise TypeError(f"Unknown effect {effect}")
+
+            # Decrease buff and debuff durations, dropping expired ones
+            buffs[rows, movers] = np.maximum(0, buffs[rows, movers] - 1)
+            debuffs[rows, movers] = np.maximum(0, debuffs[rows, movers] - 1)
+
+            # Use ability: distribute buffs and debuffs
+            for e, ability, group in groups:
+                for buff in ability.buffs:
+                    if e == boss:
+                        targets = np.array([e])
+                    elif buff.target == BuffTarget.ALL:
+                        targets = champions
                     elif buff.target == BuffTarget.SELF:
-                        target_entities = [entity_to_move]
                         raise NotImplementedError
                     else:
                         raise ValueError
+                    target_buffs = buffs[:, :, BUFF_INDICES[buff.buff_type]]
+                    target_index = np.ix_(group, targets)
+                    target_buffs[target_index] = np.maximum(target_buffs[target_index], buff.duration)
+                for debuff in ability.debuffs:
+                    targets = champions if e == boss else np.array([e])
+                    target_debuffs = debuffs[:, :, DEBUFF_INDICES[debuff.debuff_type]]
+                    target_index = np.ix_(group, targets)
+                    target_debuffs[target_index] = np.maximum(target_debuffs[target_index], debuff.duration)
 
-                for target_entity in target_entities:
-                    for existing_buff in target_entity.buffs:
-                        if buff.buff_type == existing_buff.buff_type:
-                            existing_buff.duration = max(buff.duration, existing_buff.duration)
-                            break
-                    else:
-                        target_entity.buffs.append(deepcopy(buff))
+            # Check if failed
+            boss_moved = movers == boss
+            boss_rows = rows[boss_moved]
+            demon_lord_turns[boss_rows] += 1
+            exposed = ~(buffs[boss_rows, :boss, BLOCK_DAMAGE_INDEX] > 0).all(axis=1)
+            if donnie_index is not None:
+                saved = exposed & boss_stun[chosen[boss_moved]] & (passive_cooldowns[boss_rows, donnie_index] == 0)
+                passive_cooldowns[boss_rows[saved], donnie_index] = 4
+                exposed &= ~saved
+            failed_rows = boss_rows[exposed]
+            failed[failed_rows] = True
+            results[lanes[failed_rows]] = demon_lord_turns[failed_rows] + 1
+
+        current_speeds = np.where(buffs[:, :, INCREASE_SPEED_30_INDEX] > 0, speeds * 1.3, speeds)
+        current_speeds = np.where(debuffs[:, :, DECREASE_SPEED_15_INDEX] > 0, current_speeds * 0.85, current_speeds)
+        turn_meters += np.where(extra_turn[:, None], 0, current_speeds * TURN_METER_TICK_MULTIPLIER)
+
+        # Drop lanes that failed or reached the turn limit
+        keep = ~failed & (demon_lord_turns < DEMON_LORD_TURN_LIMIT - 1)
+        if not keep.all():
+            lanes = lanes[keep]
+            speeds = speeds[keep]
+            priorities = priorities[keep]
+            delays = delays[keep]
+            turn_meters = turn_meters[keep]
+            cooldowns = cooldowns[keep]
+            buffs = buffs[keep]
+            debuffs = debuffs[keep]
+            passive_cooldowns = passive_cooldowns[keep]
+            demon_lord_turns = demon_lord_turns[keep]
+            if tie_runs is not None:
+                config_ids = config_ids[keep]
+
+    return results if tie_runs is None else (results, tied)
+
+
+def simulate_speed_samples(characters: List[CharacterConfig], demon_lord: CharacterConfig, speeds) -> np.ndarray:
+    """
+    Simulate a team at many different speeds at once with simulate_batch().
+
+    Args:
+        characters (list[CharacterConfig]): The team, in team order.
+        demon_lord (CharacterConfig): Boss configuration.
+        speeds (array-like): One row per run, with the speed of every character, fractional ones included.
+
+    Returns:
+        np.ndarray: For every row of `speeds`, the demon lord turn the team failed on, or DEMON_LORD_TURN_LIMIT if
+            it survived.
+    """
+    teams = [
+        [CharacterConfig(name=c.name, speed=speed, abilities=c.abilities) for c, speed in zip(characters, row)]
+        for row in np.asarray(speeds, dtype=np.float64).tolist()
+    ]
+    return simulate_batch(teams, demon_lord)
+
+
+def _select_variant_movers(entities: List[CharacterState], num_lanes: int) -> np.ndarray:
+    """_select_entity_to_move() for every lane at once, as entity indices (-1 if nobody is ready)."""
+    best_turn_meter = np.zeros(num_lanes)
+    movers = np.full(num_lanes, -1)
+    for i, entity in enumerate(entities):
+        better = (entity.turn_meter >= 100) & (entity.turn_meter > best_turn_meter)
+        best_turn_meter = np.where(better, entity.turn_meter, best_turn_meter)
+        movers[better] = i
+    return movers
+
+
+def _keep_lanes(entities: List[CharacterState], variant_indices: List[int], keep: np.ndarray):
+    """Drop the lanes not in `keep` from the speeds and turn meters of the varied characters."""
+    for i in variant_indices:
+        entity = entities[i]
+        config = entity.character_config
+        entity.character_config = CharacterConfig(name=config.name, speed=config.speed[keep], abilities=config.abilities)
+        if isinstance(entity.turn_meter, np.ndarray):
+            entity.turn_meter = entity.turn_meter[keep]
+
+
+def _single_lane(entities: List[CharacterState], variant_indices: List[int]):
+    """Turn the speeds and turn meters of the varied characters back into plain numbers for a one-lane branch."""
+    for i in variant_indices:
+        entity = entities[i]
+        config = entity.character_config
+        entity.character_config = CharacterConfig(name=config.name, speed=float(config.speed[0]), abilities=config.abilities)
+        if isinstance(entity.turn_meter, np.ndarray):
+            entity.turn_meter = float(entity.turn_meter[0])
+
+
+def _advance_variant_turn_meters(entities: List[CharacterState]):
+    """_advance_turn_meters() for a fight in which some turn meters hold one value per lane."""
+    turn_meter_gains = [_turn_meter_gain(entity) for entity in entities]
+
+    # Every lane ticks as far as the lane with the nearest turn allows
+    ticks = math.inf
+    for entity, gain in zip(entities, turn_meter_gains):
+        missing = 100 - TURN_METER_TOLERANCE - entity.turn_meter
+        if isinstance(gain, np.ndarray):
+            if (missing <= gain).any():
+                ticks = 1
+                break
+            moving = gain > 0
+            if moving.all():
+                ticks = min(ticks, int(np.ceil(missing / gain).min()))
+            elif moving.any():
+                missing = np.broadcast_to(missing, gain.shape)
+                ticks = min(ticks, int(np.ceil(missing[moving] / gain[moving]).min()))
+        else:
+            if missing <= gain:
+                ticks = 1
+                break
+            if gain > 0:
+                ticks = min(ticks, math.ceil(missing / gain))
+    if ticks == math.inf:
+        raise ValueError("No entity will ever reach 100 turn meter")
+
+    for entity, gain in zip(entities, turn_meter_gains):
+        entity.turn_meter = entity.turn_meter + gain
+        for _ in range(ticks - 1):
+            entity.turn_meter += gain
+
+
+def simulate_variants(
+    characters: List[CharacterConfig],
+    demon_lord: CharacterConfig,
+    variant_indices: List[int],
+    variant_speeds,
+    detect_cycles: bool = False,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+):
+    """
+    Simulate a team many times over, with only the speeds of some characters changing between runs.
+
+    Runs that have taken exactly the same turns so far are simulated together as one branch of a search
+    tree: everything but the varied characters' turn meters is the same in all of them, so it is only
+    stored and updated once, and the varied turn meters hold one value per run (lane). As soon as the lanes
+    of a branch disagree on who moves next, the branch is split and every part continues from its own
+    snapshot of the fight. One-variable speed sweeps mostly share the start of the fight, and each run
+    only pays for the part after it diverged from its neighbours.
+
+    Results are exactly those of simulate(event_driven=True).
+
+    Args:
+        characters (list[CharacterConfig]): The team, in team order.
+        demon_lord (CharacterConfig): Boss configuration.
+        variant_indices (list[int]): Indices in `characters` of the characters whose speed varies.
+        variant_speeds (array-like): One row per run, with the speeds of the varied characters in
+            `variant_indices` order.
+        detect_cycles (bool): Stop a branch once its fight repeats itself, like simulate() does.
+        tie_runs (list[tuple[int, int]] | None): Runs of characters to watch for turn meter ties (see simulate()).
+
+    Returns:
+        np.ndarray: For every row of `variant_speeds`, the demon lord turn the team failed on, or
+            DEMON_LORD_TURN_LIMIT if it survived; with `tie_runs`, together with whether each row had a tie.
+    """
+    variant_speeds = np.asarray(variant_speeds, dtype=np.float64).reshape(-1, len(variant_indices))
+    results = np.full(len(variant_speeds), DEMON_LORD_TURN_LIMIT, dtype=np.int64)
+    tied = np.zeros(len(variant_speeds), dtype=bool)
+    if len(variant_speeds) == 0:
+        return results if tie_runs is None else (results, tied)
+
+    entities = _create_entities(characters, demon_lord)
+    for column, i in enumerate(variant_indices):
+        config = entities[i].character_config
+        entities[i].character_config = CharacterConfig(
+            name=config.name, speed=variant_speeds[:, column], abilities=config.abilities
+        )
+
+    # Every branch: fight snapshot, the lanes it holds, demon lord turns taken
+    branches = [(entities, np.arange(len(variant_speeds)), 0)]
+    while branches:
+        entities, lanes, demon_lord_turns = branches.pop()
+        varied_entities = [entities[i] for i in variant_indices]
+        fixed_entities = [e for e in entities if e not in varied_entities]
+        # A branch down to one lane is cheaper to finish with the regular engine
+        single_lane = len(lanes) == 1
+        if single_lane:
+            _single_lane(entities, variant_indices)
+
+        turns = DEMON_LORD_TURN_LIMIT
+        fight_states = set()
+        while demon_lord_turns < DEMON_LORD_TURN_LIMIT - 1:
+            if single_lane:
+                entity_to_move = _select_entity_to_move(entities)
+            elif any(np.any(e.turn_meter >= 100) for e in varied_entities):
+                movers = _select_variant_movers(entities, len(lanes))
+                branch_movers = np.unique(movers)
+                for mover in branch_movers[1:]:
+                    keep = movers == mover
+                    branch = _copy_entities(entities)
+                    _keep_lanes(branch, variant_indices, keep)
+                    branches.append((branch, lanes[keep], demon_lord_turns))
+                if len(branch_movers) > 1:
+                    keep = movers == branch_movers[0]
+                    _keep_lanes(entities, variant_indices, keep)
+                    lanes = lanes[keep]
+                    # Fingerprints taken with more lanes can't repeat anymore
+                    fight_states = set()
+                    single_lane = len(lanes) == 1
+                    if single_lane:
+                        _single_lane(entities, variant_indices)
+                entity_to_move = entities[branch_movers[0]] if branch_movers[0] >= 0 else None
+            else:
+                # Nobody varied can move, so every lane agrees
+                entity_to_move = _select_entity_to_move(fixed_entities)
+            if tie_runs is not None and entity_to_move is not None:
+                lane_ties = _run_tie(entities, entity_to_move, tie_runs)
+                tied[lanes[np.broadcast_to(lane_ties, lanes.shape)]] = True
+
+            extra_turn = False
+
+            if entity_to_move is not None:
+                chosen_ability_config, extra_turn = _take_turn(entity_to_move)
 
-            # Use ability: distribute debuffs
-            for debuff in chosen_ability_config.ability.debuffs:
                 if entity_to_move.is_demon_lord:
-                    target_entities = [e for e in entities.values() if not e.is_demon_lord]
-                else:
-                    target_entities = [entity_to_move]
+                    demon_lord_turns += 1
 
-                for target_entity in target_entities:
-                    for existing_debuff in target_entity.debuffs:
-                        if debuff.debuff_type == existing_debuff.debuff_type:
-                            existing_debuff.duration = max(debuff.duration, existing_debuff.duration)
-                            break
-                    else:
-                        target_entity.debuffs.append(deepcopy(debuff))
+                if entity_to_move.is_demon_lord and _demon_lord_turn_failed(entities, chosen_ability_config):
+                    turns = demon_lord_turns + 1
+                    break
+
+                if detect_cycles and entity_to_move.is_demon_lord:
+                    fight_state = _fight_state(entities)
+                    if fight_state in fight_states:
+                        break
+                    fight_states.add(fight_state)
+
+            if extra_turn:
+                pass
+            elif single_lane:
+                _advance_turn_meters(entities, event_driven=True)
+            else:
+                _advance_variant_turn_meters(entities)
+
+        results[lanes] = turns
+
+    return results if tie_runs is None else (results, tied)
+
+
+def _fight_on(entities: List[CharacterState], detect_cycles: bool, event_driven: bool, tie_runs=None) -> tuple:
+    """
+    Go on with a fight in which the demon lord hasn't moved yet, returning what simulate() would and whether there
+    was a tie between characters of `tie_runs` (see simulate()).
+    """
+    demon_lord_turns = 0
+    fight_states = set()
+    tied = False
+    while demon_lord_turns < DEMON_LORD_TURN_LIMIT - 1:
+        entity_to_move = _select_entity_to_move(entities)
+        if tie_runs is not None and entity_to_move is not None and not tied:
+            tied = _run_tie(entities, entity_to_move, tie_runs)
+
+        extra_turn = False
+
+        if entity_to_move is not None:
+            chosen_ability_config, extra_turn = _take_turn(entity_to_move)
 
             if entity_to_move.is_demon_lord:
                 demon_lord_turns += 1
+                if _demon_lord_turn_failed(entities, chosen_ability_config):
+                    return demon_lord_turns + 1, tied
 
-            if debug:
-                event_name = "[CB turn]" if entity_to_move.is_demon_lord else "[champ turn]"
-                print(
-                    f"{event_name} character: {entity_to_move.uid}, ability: {chosen_ability_config.ability.name}, active buffs: {entity_to_move.buffs}, active debuffs: {entity_to_move.debuffs}"
-                )
+                if detect_cycles:
+                    fight_state = _fight_state(entities)
+                    if fight_state in fight_states:
+                        return DEMON_LORD_TURN_LIMIT, tied
+                    fight_states.add(fight_state)
 
-            # Check if failed
-            if entity_to_move.is_demon_lord:
-                failed = False
-
-                everyone_has_block_damage = True
-                for character in entities.values():
-                    if character.is_demon_lord:
-                        continue
-                    character_has_block_damage = False
-                    for character_buff in character.buffs:
-                        if character_buff.buff_type == BuffType.BLOCK_DAMAGE:
-                            character_has_block_damage = True
-                            break
-                    if not character_has_block_damage:
-                        everyone_has_block_damage = False
-                        break
+        if not extra_turn:
+            _advance_turn_meters(entities, event_driven)
 
-                if not everyone_has_block_damage:
-                    if chosen_ability_config.ability.name == DEMON_LORD_A1.name:
-                        donnie = None
-                        for character in entities.values():
-                            if character.character_config.name == DONNIE.name:
-                                donnie = character
-
-                        if donnie is not None:
-                            if donnie.donnies_passive_cooldown == 0:
-                                donnie.donnies_passive_cooldown = 4
-                            else:
-                                failed = True
-                        else:
-                            failed = True
-                    else:
-                        failed = True
+    return demon_lord_turns + 1, tied
 
-                if failed:
-                    return demon_lord_turns + 1
 
-        if not extra_turn:
-            for entity in entities.values():
-                current_speed = entity.character_config.speed
-                for buff in entity.buffs:
-                    if buff.buff_type == BuffType.INCREASE_SPEED_30:
-                        current_speed *= 1.3
-                for debuff in entity.debuffs:
-                    if debuff.debuff_type == DebuffType.DECREASE_SPEED_15:
-                        current_speed *= 0.85
-                entity.turn_meter += current_speed * TURN_METER_TICK_MULTIPLIER
+def simulate_bosses(
+    characters: List[CharacterConfig],
+    demon_lords: List[CharacterConfig],
+    detect_cycles: bool = False,
+    event_driven: bool = False,
+    tie_runs: Optional[List[Tuple[int, int]]] = None,
+):
+    """
+    Simulate a team against several bosses, sharing the fight up to the first boss turn.
 
-        if debug:
-            print("\n[tick]")
-            for e in entities.values():
-                print(f"\tcharacter: {e.uid}, turn meter: {e.turn_meter}, ability cooldowns: {e.ability_cooldowns}")
+    Nothing the champions do reaches the demon lord, and a faster boss never has less turn meter than a slower
+    one, so the champions take the same turns against every boss until the fastest one moves. Those turns are
+    simulated once; every boss then fights on from a copy of them, as far as its own failure.
+
+    Returns:
+        list[int]: For every boss, what simulate() returns against it; with `tie_runs`, together with whether there
+            was a tie against any of them (see simulate()).
+    """
+    fastest = max(demon_lords, key=lambda boss: boss.speed)
+    entities = _create_entities(characters, fastest)
+    demon_lord_entity = entities[-1]
+
+    elapsed_ticks = 0
+    tied = False
+    while True:
+        entity_to_move = _select_entity_to_move(entities)
+        if entity_to_move is demon_lord_entity:
+            break
+        if tie_runs is not None and entity_to_move is not None and not tied:
+            tied = _run_tie(entities, entity_to_move, tie_runs)
+
+        extra_turn = False
+        if entity_to_move is not None:
+            _, extra_turn = _take_turn(entity_to_move)
+        if not extra_turn:
+            elapsed_ticks += _advance_turn_meters(entities, event_driven)
 
-    return demon_lord_turns + 1
+    results = []
+    for i, boss in enumerate(demon_lords):
+        # The last boss fights on from the shared state itself
+        boss_entities = entities if i == len(demon_lords) - 1 else _copy_entities(entities)
+        if boss is not fastest:
+            boss_entity = boss_entities[-1]
+            boss_entity.character_config = boss
+            boss_entity.ability_cooldowns = [0 for _ in boss.abilities]
+            boss_entity.ability_delays = [ability.delay for ability in boss.abilities]
+            # Tick by tick, like the engine, for bit-identical turn meters
+            gain = _turn_meter_gain(boss_entity)
+            boss_entity.turn_meter = 0
+            for _ in range(elapsed_ticks):
+                boss_entity.turn_meter += gain
+        turns, boss_tied = _fight_on(boss_entities, detect_cycles, event_driven, tie_runs)
+        results.append(turns)
+        tied = tied or boss_tied
+    return results if tie_runs is None else (results, tied)
 
 
 def test():
+    recorder = TraceRecorder()
     turns = simulate(
         # MythHeirAlternate
         # characters=[
@@ -342,8 +1701,13 @@ def test():
             DPS_3.to_config(speed=95 * (1 + (0.1 * 1.15)) + 80, priorities=[1]),  # orn - LoS
         ],
         demon_lord=DEMON_LORD_UNM,
-        debug=True,
+        trace=recorder,
     )
+    trace = recorder.trace()
+    print(trace.format())
+    # To compare with another tune or an in-game run (Trace.from_turns()), save it and use
+    # `python raid_cb_simulator/traces.py diff a.npz b.npz`
+    # trace.save("trace.npz")
     if turns == DEMON_LORD_TURN_LIMIT:
         print("Run successful")
     else:
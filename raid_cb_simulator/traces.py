@@ -0,0 +1,179 @@
+import argparse
+import json
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from effects import BuffType, DebuffType
+
+# Bits of a record's flags
+EXTRA_TURN = 1
+FAILED = 2
+
+
+def trace_dtype(num_entities: int) -> np.dtype:
+    """
+    Record of one turn in a fight with `num_entities` entities (the demon lord last).
+
+    Turn meters are everyone's at the moment the turn is taken, before the entity moving resets its own, and are
+    in points of turn meter even for fixed-point fights. Buffs and debuffs are everyone's right after the turn,
+    as bitmasks with bit i set for the i-th BuffType/DebuffType.
+    """
+    return np.dtype(
+        [
+            ("tick", "<i4"),
+            ("entity", "i1"),
+            ("ability", "i1"),
+            ("flags", "u1"),
+            ("turn_meters", "<f8", (num_entities,)),
+            ("buffs", "u1", (num_entities,)),
+            ("debuffs", "u1", (num_entities,)),
+        ]
+    )
+
+
+@dataclass
+class Trace:
+    """Every turn of one fight as trace_dtype() records, with the names of the entities and of their abilities."""
+
+    names: List[str]
+    abilities: List[List[str]]
+    records: np.ndarray
+
+    def save(self, path: str):
+        """Write the trace to an .npz file."""
+        np.savez(path, records=self.records, header=json.dumps({"names": self.names, "abilities": self.abilities}))
+
+    @classmethod
+    def load(cls, path: str) -> "Trace":
+        with np.load(path) as data:
+            header = json.loads(str(data["header"]))
+            return cls(names=header["names"], abilities=header["abilities"], records=data["records"])
+
+    @classmethod
+    def from_turns(cls, names: List[str], abilities: List[List[str]], turns: Sequence[Tuple[int, int]]) -> "Trace":
+        """
+        Trace of a fight that was only watched, e.g. in game: who moved and with which ability, as (entity index,
+        ability index) pairs. Ticks are -1 and turn meters NaN; compare it with diff_traces().
+        """
+        records = np.zeros(len(turns), dtype=trace_dtype(len(names)))
+        records["tick"] = -1
+        records["turn_meters"] = math.nan
+        for record, (entity, ability) in zip(records, turns):
+            record["entity"] = entity
+            record["ability"] = ability
+        return cls(names=list(names), abilities=[list(a) for a in abilities], records=records)
+
+    def format_turn(self, i: int) -> str:
+        record = self.records[i]
+        entity = int(record["entity"])
+        name = f"{self.names[entity]}-{entity}"
+        flags = int(record["flags"])
+        line = f"{i:4d} tick {int(record['tick']):5d}  {name:<16} {self.abilities[entity][record['ability']]:<18}"
+        if flags & EXTRA_TURN:
+            line += " [extra turn]"
+        if flags & FAILED:
+            line += " [failed]"
+        turn_meters = " ".join(f"{tm:7.2f}" for tm in record["turn_meters"])
+        effects = []
+        for e, (buffs, debuffs) in enumerate(zip(record["buffs"], record["debuffs"])):
+            active = [b.name for i, b in enumerate(BuffType) if buffs >> i & 1]
+            active += [d.name for i, d in enumerate(DebuffType) if debuffs >> i & 1]
+            if active:
+                effects.append(f"{self.names[e]}-{e}: {','.join(active)}")
+        return f"{line.rstrip()}\n       turn meters: {turn_meters}" + (f"\n       {'; '.join(effects)}" if effects else "")
+
+    def format(self) -> str:
+        """The whole trace, one turn per line, with everyone's turn meters and active buffs/debuffs below it."""
+        return "\n".join(self.format_turn(i) for i in range(len(self.records)))
+
+
+class TraceRecorder:
+    """
+    Collects a Trace while simulate() runs (see its `trace` argument).
+
+    Records are written into a preallocated array of `capacity` turns, which is doubled whenever it fills up, so
+    recording a turn is a handful of array writes rather than any formatting.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.names: List[str] = []
+        self.abilities: List[List[str]] = []
+        self.records: Optional[np.ndarray] = None
+        self.length = 0
+
+    def start(self, entities):
+        """Set up for a fight between `entities` (see _create_entities() in simulator.py)."""
+        self.names = [e.character_config.name for e in entities]
+        self.abilities = [[a.ability.name for a in e.character_config.abilities] for e in entities]
+        self.records = np.zeros(self.capacity, dtype=trace_dtype(len(entities)))
+        self.length = 0
+
+    def record(self, tick: int, entities, entity, ability: int, flags: int, turn_meters: List[float]):
+        """Record a turn of `entity`, given everyone's turn meters from before it moved."""
+        if self.length == len(self.records):
+            self.records = np.concatenate([self.records, np.zeros_like(self.records)])
+        record = self.records[self.length]
+        record["tick"] = tick
+        record["entity"] = entity.id
+        record["ability"] = ability
+        record["flags"] = flags
+        record["turn_meters"] = [tm / e.turn_meter_unit for tm, e in zip(turn_meters, entities)]
+        record["buffs"] = [sum(1 << i for i, d in enumerate(e.buff_durations) if d > 0) for e in entities]
+        record["debuffs"] = [sum(1 << i for i, d in enumerate(e.debuff_durations) if d > 0) for e in entities]
+        self.length += 1
+
+    def trace(self) -> Trace:
+        """The turns recorded so far."""
+        return Trace(names=self.names, abilities=self.abilities, records=self.records[: self.length].copy())
+
+
+def diff_traces(a: Trace, b: Trace, exact: bool = False) -> Optional[Tuple[int, str]]:
+    """
+    Find the first turn on which two traces disagree.
+
+    By default only who moved and with which ability are compared, which is all an in-game run (see
+    Trace.from_turns()) has. With `exact`, ticks, flags, turn meters and buffs/debuffs have to match as well.
+
+    Returns:
+        tuple[int, str] | None: The index of the first differing turn and a description of the difference, or
+            None if the traces are the same.
+    """
+    fields = ["entity", "ability"] + (["tick", "flags", "turn_meters", "buffs", "debuffs"] if exact else [])
+    for i, (record_a, record_b) in enumerate(zip(a.records, b.records)):
+        for field in fields:
+            if not np.array_equal(record_a[field], record_b[field]):
+                return i, f"{field} differs:\n  a: {a.format_turn(i)}\n  b: {b.format_turn(i)}"
+    if len(a.records) != len(b.records):
+        shorter = min(len(a.records), len(b.records))
+        return shorter, f"a has {len(a.records)} turns, b has {len(b.records)}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print or compare traces saved with Trace.save()")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show = subparsers.add_parser("show", help="Print a trace")
+    show.add_argument("path")
+    diff = subparsers.add_parser("diff", help="Find the first turn on which two traces disagree")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--exact", action="store_true", help="Compare ticks, turn meters and buffs as well")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(Trace.load(args.path).format())
+        return
+    difference = diff_traces(Trace.load(args.a), Trace.load(args.b), args.exact)
+    if difference is None:
+        print("Traces are the same")
+    else:
+        turn, description = difference
+        print(f"First difference at turn {turn}: {description}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules import each other both as raid_cb_simulator.x and, like the scripts do, as plain x
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "raid_cb_simulator")]
@@ -0,0 +1,41 @@
+import pytest
+
+from raid_cb_simulator.benchmark import REFERENCE_TEAMS, SWEEP_FIXED
+from raid_cb_simulator.characters import DEMON_LORD_NM, DEMON_LORD_UNM, DPS_1, DPS_2, DPS_3
+from raid_cb_simulator.instrumentation import SimulationStats
+from raid_cb_simulator.runner import run_variable_configs, run_variable_selections
+from raid_cb_simulator.simulator import simulate
+
+BOSSES = [DEMON_LORD_NM, DEMON_LORD_UNM]
+
+
+def test_shared_bosses_match_one_fight_per_boss():
+    teams = list(REFERENCE_TEAMS.values()) + [
+        SWEEP_FIXED + [dps.to_config(speed=speed, priorities=[1]) for dps in [DPS_1, DPS_2, DPS_3]]
+        for speed in range(176, 196)
+    ]
+    for team in teams:
+        for bosses in [BOSSES, BOSSES[::-1], [DEMON_LORD_UNM]]:
+            expected = [simulate(team, boss, event_driven=True, detect_cycles=True) for boss in bosses]
+            assert simulate(team, bosses, event_driven=True, detect_cycles=True) == expected
+
+
+def test_per_boss_stats():
+    team = REFERENCE_TEAMS["demytha_donnie"]
+    stats = [SimulationStats(), SimulationStats()]
+    simulate(team, BOSSES, event_driven=True, stats=stats)
+    assert [s.simulations for s in stats] == [1, 1]
+    assert stats[0].failures != stats[1].failures
+    with pytest.raises(ValueError):
+        simulate(team, BOSSES, event_driven=True, stats=SimulationStats())
+
+
+@pytest.mark.parametrize("option", [{"batch_size": 64}, {"store": object()}, {"grid_step": 4}])
+def test_bosses_not_supported_with(option):
+    with pytest.raises(ValueError):
+        run_variable_configs((180, 182), SWEEP_FIXED, [DPS_1, DPS_2, DPS_3], BOSSES, 50, **option)
+
+
+def test_bosses_not_supported_with_store_selections():
+    with pytest.raises(ValueError):
+        run_variable_selections((180, 182), [SWEEP_FIXED], [DPS_1, DPS_2, DPS_3], BOSSES, 50, None, store=object())
@@ -0,0 +1,9 @@
+import json
+
+from raid_cb_simulator.benchmark import GOLDEN_PATH, check_golden
+
+
+def test_engines_match_golden_turns():
+    with open(GOLDEN_PATH) as f:
+        mismatches = check_golden(json.load(f))
+    assert mismatches == {engine: [] for engine in mismatches}
@@ -0,0 +1,38 @@
+import itertools
+
+import pytest
+
+from raid_cb_simulator.characters import DEMON_LORD_UNM, DEMYTHA, DONNIE_MINE, DPS_1, DPS_2, DPS_3
+from raid_cb_simulator.runner import search_variable_configs
+from raid_cb_simulator.simulator import DEMON_LORD_TURN_LIMIT, simulate
+
+FIXED = [
+    DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+    DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+    DPS_1.to_config(speed=270, priorities=[1]),
+]
+# DPS_2 at 270 and DPS_3 at 120 survive, but not the other way around: DPS_2 and DPS_3 tie on turn meter
+SPEED_RANGE = (100, 281)
+
+
+@pytest.mark.parametrize("option", [{"specialized": True}, {"batch_size": 64}])
+def test_search_matches_brute_force(option):
+    found = {
+        tuple(c.speed for c in result.team[len(FIXED) :])
+        for result in search_variable_configs(
+            SPEED_RANGE, FIXED, [DPS_2, DPS_3], DEMON_LORD_UNM, DEMON_LORD_TURN_LIMIT, **option
+        )
+    }
+    brute_force = {
+        speeds
+        for speeds in itertools.product(range(*SPEED_RANGE), repeat=2)
+        if simulate(
+            FIXED + [dps.to_config(speed=speed, priorities=[1]) for dps, speed in zip([DPS_2, DPS_3], speeds)],
+            DEMON_LORD_UNM,
+            detect_cycles=True,
+            specialized=True,
+        )
+        == DEMON_LORD_TURN_LIMIT
+    }
+    assert (270, 120) in brute_force
+    assert found == brute_force
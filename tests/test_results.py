@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from raid_cb_simulator.benchmark import SWEEP_FIXED
+from raid_cb_simulator.characters import DPS_1
+from raid_cb_simulator.results import RESULT_STORE_SCHEMA, ResultStore
+
+
+def test_store_keeps_every_result(tmp_path):
+    teams = [SWEEP_FIXED + [DPS_1.to_config(speed=speed, priorities=[1])] for speed in (180, 181, 182)]
+    with ResultStore(str(tmp_path / "results.db")) as store:
+        sweep_id = store.sweep("sweep", 50)
+        store.add_chunk(sweep_id, 0, teams, [50, 7, 50], [False, True, False])
+        assert store.done_chunks(sweep_id) == {0: [(0, 50, False), (1, 7, True), (2, 50, False)]}
+        assert store.counts(sweep_id) == (3, 2)
+        assert [turns for _, turns in store.results(sweep_id)] == [50, 7, 50]
+        assert [turns for _, turns in store.results(sweep_id, survived_only=True)] == [50, 50]
+
+    # Opening it again finds the sweep as it was left
+    with ResultStore(str(tmp_path / "results.db")) as store:
+        sweep_id = store.sweep("sweep", 50)
+        assert store.done_chunks(sweep_id) == {0: [(0, 50, False), (1, 7, True), (2, 50, False)]}
+        store.add_chunk(sweep_id, 1, teams[:1], [50])
+        assert store.done_chunks(sweep_id)[1] == [(0, 50, False)]
+
+
+@pytest.mark.parametrize("schema", [0, RESULT_STORE_SCHEMA + 1])
+def test_store_rejects_other_schemas(tmp_path, schema):
+    path = str(tmp_path / "results.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE chunks (sweep_id INTEGER NOT NULL, chunk INTEGER NOT NULL)")
+        connection.execute(f"PRAGMA user_version = {schema}")
+    connection.close()
+    with pytest.raises(ValueError, match="schema"):
+        ResultStore(path)
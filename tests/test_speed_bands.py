@@ -0,0 +1,53 @@
+import itertools
+
+from raid_cb_simulator import runner
+from raid_cb_simulator.characters import DEMON_LORD_UNM, DEMYTHA, DONNIE_MINE, DPS_1, DPS_2, DPS_3
+from raid_cb_simulator.runner import adaptive_speed_search
+from raid_cb_simulator.simulator import DEMON_LORD_TURN_LIMIT, simulate
+
+
+def test_adaptive_search_matches_dense_scan(monkeypatch):
+    # Fights as run_some_selections_fast() runs them
+    monkeypatch.setattr(runner, "_specialized", True)
+    configs = [DPS_3.to_config(speed=speed, priorities=[1]) for speed in range(0, 401)]
+    for dps_1_speed in range(264, 275):
+        for dps_2_speed in range(270, 275):
+            fixed = [
+                DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+                DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+                DPS_1.to_config(speed=dps_1_speed, priorities=[1]),
+                DPS_2.to_config(speed=dps_2_speed, priorities=[1]),
+            ]
+            bands, _, _ = adaptive_speed_search(fixed, DEMON_LORD_UNM, [configs], 16, DEMON_LORD_TURN_LIMIT)
+            found = [i for _, low, high in bands for i in range(low, high + 1)]
+            dense = [
+                i
+                for i, config in enumerate(configs)
+                if simulate(fixed + [config], DEMON_LORD_UNM, detect_cycles=True, specialized=True)
+                == DEMON_LORD_TURN_LIMIT
+            ]
+            assert found == dense, (dps_1_speed, dps_2_speed)
+
+
+def test_adaptive_search_reports_ties(monkeypatch):
+    monkeypatch.setattr(runner, "_specialized", True)
+    fixed = [
+        DEMYTHA.to_config(speed=257, priorities=[1, 3, 2], delays=[0, 1, 0]),
+        DONNIE_MINE.to_config(speed=188, priorities=[1, 3, 2], delays=[0, 0, 0]),
+        DPS_1.to_config(speed=270, priorities=[1]),
+    ]
+    speeds = range(100, 281)
+    groups = [[dps.to_config(speed=speed, priorities=[1]) for speed in speeds] for dps in (DPS_2, DPS_3)]
+    bands, ties, _ = adaptive_speed_search(fixed, DEMON_LORD_UNM, groups, 16, DEMON_LORD_TURN_LIMIT, runs=[2])
+    found = {prefix + (i,) for prefix, low, high in bands for i in range(low, high + 1)}
+
+    def fight(i, j):
+        return simulate(fixed + [groups[0][i], groups[1][j]], DEMON_LORD_UNM, detect_cycles=True, specialized=True)
+
+    # Only one ordering is searched: the other must come out the same unless the search reported a tie
+    for i, j in itertools.combinations_with_replacement(range(len(speeds)), 2):
+        turns = fight(i, j)
+        assert ((i, j) in found) == (turns == DEMON_LORD_TURN_LIMIT), (i, j)
+        if fight(j, i) != turns:
+            assert ties.get((i, j)) == turns, (i, j)
+    assert ties